@@ -1,36 +1,167 @@
 import ctypes
+import importlib.util
+import json
+import os
+import sys
 import time
-import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+
+import settings
+import incremental
+import checkpoint
+import metrics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # 防止電腦進入睡眠模式
 ES_CONTINUOUS = 0x80000000
 ES_SYSTEM_REQUIRED = 0x00000001
 
-# 使用 ctypes 與 Windows API 交互
-ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS | ES_SYSTEM_REQUIRED)
-
-# 要執行的6個程式的路徑
-scripts = [
-    r'G:\我的雲端硬碟\Indie Hackers\Low-Hanging Fruits Strategy\1.range.py',
-    r'G:\我的雲端硬碟\Indie Hackers\Low-Hanging Fruits Strategy\2A.dividend.py',
-    r'G:\我的雲端硬碟\Indie Hackers\Low-Hanging Fruits Strategy\2B.dividend.py',
-    r'G:\我的雲端硬碟\Indie Hackers\Low-Hanging Fruits Strategy\2C.dividend.py',
-    r'G:\我的雲端硬碟\Indie Hackers\Low-Hanging Fruits Strategy\2D.dividend.py',
-    r'G:\我的雲端硬碟\Indie Hackers\Low-Hanging Fruits Strategy\3.calculation.py'
-]
-
-# 依序執行每個程式，並且每次執行完後等待6分鐘
-for index, script in enumerate(scripts):
-    print(f"正在執行 {script}...")
-    subprocess.run(['python', script])
-    print(f"{script} 執行完畢")
-    
-    # 只有在不是最後一個腳本的時候才等待6分鐘
-    if index < len(scripts) - 1:
-        print("等待6分鐘...")
-        time.sleep(6 * 60)  # 6分鐘 = 6 * 60秒
-
-print("所有程式已執行完畢。")
-
-# 恢復正常的電源設定
-ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS)
+# 各階段要執行的程式、必須先完成的階段，以及完成後應該產出的檔案
+# 階段一旦依賴全部完成就立即啟動，彼此沒有依賴的階段會同時執行
+STAGES = {
+    '1.range': {
+        'script': '1.range.py',
+        'after': [],
+        'outputs': [settings.STAGE_TWO_PATH],
+    },
+    '2.dividend': {
+        'script': '2.dividend.py',
+        'after': ['1.range'],
+        'outputs': [settings.DIVIDEND_STAGE_PATH],
+    },
+    '3.calculation': {
+        'script': '3.calculation.py',
+        'after': ['2.dividend'],
+        'outputs': [settings.REPORT_PATH],
+    },
+    # 為合格股票批次建立財報檔，只依賴階段二的清單，與配息階段同時進行
+    'statements': {
+        'script': 'Income Statement.py',
+        'after': ['1.range'],
+        'outputs': [],
+        'enabled_by': '--statements',
+    },
+}
+
+# 只有 Windows 需要透過 ctypes 與 Windows API 交互，其他平台直接執行
+@contextmanager
+def keep_awake():
+    if sys.platform != 'win32':
+        yield
+        return
+    ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS | ES_SYSTEM_REQUIRED)
+    try:
+        yield
+    finally:
+        # 恢復正常的電源設定
+        ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS)
+
+# 在同一個行程中載入階段腳本 (檔名含有「.」無法直接 import)
+def load_stage_module(name, script):
+    module_name = 'stage_' + name.replace('.', '_').replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, script))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def run_stage(name, stage):
+    print(f"正在執行 {name}...")
+    started_at = time.time()
+    start = time.perf_counter()
+
+    module = load_stage_module(name, stage['script'])
+    module.main()
+
+    # 確認階段確實產出了下游需要的檔案
+    for path in stage['outputs']:
+        if not os.path.exists(path) or os.path.getmtime(path) < started_at:
+            raise RuntimeError(f"{name} 未產出 {path}")
+
+    elapsed = time.perf_counter() - start
+    metrics.record_stage(name, elapsed)
+    print(f"{name} 執行完畢，耗時 {elapsed:.2f} 秒")
+    return {'start': started_at, 'seconds': round(elapsed, 3)}
+
+def run_pipeline(stages, max_parallel=None):
+    """依照階段之間的依賴關係執行，回傳 (每個階段的狀態, 每個階段的計時)"""
+    status = {}
+    timings = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_parallel or len(stages)) as executor:
+        while pending or running:
+            # 反覆檢查，讓失敗的影響一路傳遞到下游階段
+            changed = True
+            while changed:
+                changed = False
+                for name, stage in list(pending.items()):
+                    deps = stage['after']
+                    if any(status.get(dep) in ('failed', 'skipped') for dep in deps):
+                        print(f"{name} 的上游階段未完成，略過")
+                        status[name] = 'skipped'
+                        del pending[name]
+                        changed = True
+                    elif all(status.get(dep) == 'done' for dep in deps):
+                        running[executor.submit(run_stage, name, stage)] = name
+                        del pending[name]
+
+            if not running:
+                # 剩下的階段依賴了不存在的階段，無法啟動
+                for name in pending:
+                    print(f"{name} 的依賴無法滿足，略過")
+                    status[name] = 'skipped'
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                    status[name] = 'done'
+                except (Exception, SystemExit) as exc:
+                    print(f"{name} 執行失敗: {exc}")
+                    status[name] = 'failed'
+
+    return status, timings
+
+def main():
+    start = time.perf_counter()
+    # 帶有 enabled_by 的階段只在命令列加上對應參數時執行
+    stages = {name: stage for name, stage in STAGES.items()
+              if 'enabled_by' not in stage or stage['enabled_by'] in sys.argv[1:]}
+
+    # --incremental：只重新抓取財報期別或除權息事件有變動的股票 (收盤價仍每次更新)
+    if '--incremental' in sys.argv[1:]:
+        incremental.set_incremental()
+
+    # --resume：接續最近一次的執行，各階段略過其檢查點中已完成的股票；未指定時每次都重新抓取
+    if '--resume' in sys.argv[1:] and checkpoint.resume_latest() is None:
+        print("找不到可接續的執行，重新開始")
+    print(f"執行編號: {checkpoint.RUN_ID}")
+
+    with keep_awake():
+        status, timings = run_pipeline(stages)
+    total = time.perf_counter() - start
+
+    print("各階段執行時間:")
+    for name in stages:
+        seconds = timings.get(name, {}).get('seconds')
+        print(f"  {name}: {status.get(name)}" + (f"，{seconds:.2f} 秒" if seconds is not None else ""))
+    print(f"總執行時間: {total:.2f} 秒")
+
+    # 保存本次執行的計時紀錄
+    timings_path = os.path.join(settings.OUTPUT_DIR, 'pipeline_timings.json')
+    with open(timings_path, 'w', encoding='utf-8') as f:
+        json.dump({'total_seconds': round(total, 3), 'status': status, 'stages': timings}, f, ensure_ascii=False, indent=2)
+
+    if all(value == 'done' for value in status.values()):
+        print("所有程式已執行完畢。")
+    else:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,44 @@
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
-import yfinance as yf
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import settings
+import incremental
+import checkpoint
+import fundamentals_store
+import metrics
+from yahoo_snapshot import get_snapshot
+from stage_io import write_stage, export_csv, REVENUE_COLUMNS, STAGE_TWO_SCHEMA
+from http_cache import cached_get
+from html_parsing import parse_isin_codes
 
 # 抓取上市和上櫃公司股票代碼
 def get_all_stock_codes(market_type):
     """抓取所有股票代碼，market_type=2是上市公司，market_type=4是上櫃公司"""
     url = f"https://isin.twse.com.tw/isin/C_public.jsp?strMode={market_type}"
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    table = soup.find("table", {"class": "h4"})
-    rows = table.find_all("tr")[1:]  # 跳過標題行
-
-    stock_codes = []
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) > 0:
-            stock_info = cols[0].text.strip()
-            if stock_info:
-                code = stock_info.split()[0]
-                if code.isdigit():
-                    stock_codes.append(code)
-
-    return stock_codes
-
-# 將數字轉換為千元並以會計符號顯示
-def format_to_thousands(x):
-    if pd.isna(x):
-        return x
-    return "{:,.2f}".format(x / 1000)
+    response = cached_get(url)
+    return parse_isin_codes(response.text)
+
+# 白名單代號 (金融股)，與 EPS 持股一樣不需判斷營業利益比率，直接設定為 qualified
+WHITELIST = ['2880', '2881', '2882', '2883', '2884', '2885', '2886', '2887', '2888', '2889', '2890', '2891', '2892', '5880']
+
+# 營業利益 / 稅前淨利比率在此區間內為 qualified
+RATIO_RANGE = (0.7, 1.3)
+
+# 將數字轉換為千元 (保留數值型態，千分位格式在匯出時才加上)
+def to_thousands(values):
+    return values / 1000
+
+# 市場代碼 (2: 上市，4: 上櫃) 對應的市場類型
+MARKET_NAMES = {2: '上市', 4: '上櫃'}
 
 # 從Yahoo Finance抓取財務數據
-def fetch_yahoo_financial_data(ticker):
-    stock = yf.Ticker(ticker)
-    quarterly_financials = stock.quarterly_financials
+def fetch_yahoo_financial_data(stock_code, market_type):
+    # 經由共用的快照抓取，套用 Yahoo 斷路器、速率限制與計量
+    quarterly_financials = get_snapshot(stock_code, MARKET_NAMES[market_type]).quarterly_financials
+    # 完整的季度資料存入本機基本面資料庫，累積歷史
+    fundamentals_store.record_statement(str(stock_code), quarterly_financials, ['Operating Income', 'Pretax Income', 'Diluted EPS'], 'Q')
     operating_income = quarterly_financials.loc['Operating Income'].head(4)
     pretax_income = quarterly_financials.loc['Pretax Income'].head(4)
     return operating_income, pretax_income
@@ -55,21 +56,16 @@ def fetch_stage_one_financial_data(stock_list, market_type):
         end   = datetime.date(today.year, 3, 10)
         special_period = start <= today <= end
 
-        response = requests.get(api_url)
+        response = cached_get(api_url)
         response.raise_for_status()
         data = response.json()
         df = pd.DataFrame(data)
         df.columns = df.columns.str.strip()
         df = df[df['公司代號'].isin(stock_list)]
 
-        numeric_columns = [
-            '營業收入-當月營收', '營業收入-上月營收', '營業收入-去年當月營收',
-            '累計營業收入-當月累計營收', '累計營業收入-上月累計營收', '累計營業收入-去年累計營收'
-        ]
-        for col in numeric_columns:
+        for col in REVENUE_COLUMNS:
             if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').round(2)
-                df[col] = df[col].apply(format_to_thousands)
+                df[col] = to_thousands(pd.to_numeric(df[col], errors='coerce'))
 
         market_label = '上市' if market_type == 2 else '上櫃'
         df['市場類型'] = market_label
@@ -78,7 +74,7 @@ def fetch_stage_one_financial_data(stock_list, market_type):
 
         if special_period:
             print("⚠️ 當前時間在 2/1~3/10，將使用 Excel 數據替換「累計營業收入-前期比較增減(%)」")
-            excel_path = r"G:\我的雲端硬碟\Horizon\python_stock\202412revenue.xlsx"
+            excel_path = settings.SPECIAL_PERIOD_REVENUE_PATH
             excel_df = pd.read_excel(excel_path, usecols=[0, 2])
             excel_df.columns = ['公司代號', '累計營業收入-前期比較增減(%)']
             excel_df['公司代號'] = excel_df['公司代號'].astype(str)
@@ -88,72 +84,80 @@ def fetch_stage_one_financial_data(stock_list, market_type):
             df.drop(columns=['累計營業收入-前期比較增減(%)_excel'], inplace=True)
 
         df_stage_one = df[df['累計營業收入-前期比較增減(%)'] > 0].copy()
-        df_stage_one['Operating Income / Pretax Income Ratio'] = None
         return df, df_stage_one
     except requests.exceptions.RequestException as err:
         print(f"Error occurred: {err}")
     return None, None
 
-# 處理單隻股票的財務數據
-def process_single_stock(index, row, market_type):
-    ticker = f"{row['公司代號']}.{'TW' if market_type == 2 else 'TWO'}"
+# 階段二新增的欄位
+STAGE_TWO_COLUMNS = ['Operating Income / Pretax Income Ratio'] + [
+    f'{item} Q{i+1}' for i in range(4) for item in ('Operating Income', 'Pretax Income')
+]
+
+# 處理單隻股票的財務數據，回傳只含新增欄位的 dict，抓取失敗時回傳空 dict
+def process_single_stock(stock_code, market_type):
+    ticker = f"{stock_code}.{'TW' if market_type == 2 else 'TWO'}"
+    record = {}
     try:
-        operating_income, pretax_income = fetch_yahoo_financial_data(ticker)
+        operating_income, pretax_income = fetch_yahoo_financial_data(stock_code, market_type)
         total_operating_income = operating_income.sum()
         total_pretax_income = pretax_income.sum()
         ratio = total_operating_income / total_pretax_income if total_pretax_income != 0 else 0
-        row['Operating Income / Pretax Income Ratio'] = ratio
+        record['Operating Income / Pretax Income Ratio'] = ratio
 
         for i in range(4):
-            row[f'Operating Income Q{i+1}'] = format_to_thousands(operating_income.iloc[i])
-            row[f'Pretax Income Q{i+1}'] = format_to_thousands(pretax_income.iloc[i])
+            record[f'Operating Income Q{i+1}'] = to_thousands(operating_income.iloc[i])
+            record[f'Pretax Income Q{i+1}'] = to_thousands(pretax_income.iloc[i])
 
     except Exception as e:
         print(f"Failed to fetch data for {ticker}: {e}")
 
-    return index, row
+    return record
 
 # 抓取第二階段資料
 def fetch_stage_two_financial_data(df_stage_one, market_type):
     """階段二：並行抓取通過階段一的股票的Operating Income及Pretax Income，並進行條件判斷"""
 
     # 讀取"EPS持股"sheet中的position欄位
-    eps_file_path = r"G:\我的雲端硬碟\Horizon\Additional Data_LHF.xlsx"
+    eps_file_path = settings.ADDITIONAL_DATA_PATH
     eps_df = pd.read_excel(eps_file_path, sheet_name='EPS持股')
     positions = eps_df['position'].astype(str).tolist()
 
+    # EPS 持股與白名單代號在抓取前就決定為 qualified，不必再向 Yahoo 查詢
+    codes = df_stage_one['公司代號'].astype(str)
+    held = codes.isin(positions)
+    auto_qualified = held | codes.isin(WHITELIST)
+    for code in codes[held]:
+        print(f"公司代號 {code} 符合 EPS 持股的 position 標準，設定為 qualified")
+
+    # 各執行緒只回傳結果，全部完成後一次併回，不在迴圈中逐列寫入 DataFrame
+    # 本次執行中斷前已完成的股票直接取用檢查點；增量模式下，財報期別沒有變動的股票沿用上次的結果
+    to_fetch = codes[~auto_qualified]
+    journal = checkpoint.open_journal('stage_two')
+    cached = journal.load()
+    reused, _ = incremental.reuse_records('stage_two', [code for code in to_fetch if code not in cached])
+    cached.update(reused)
+    records = {index: cached[code] for index, code in to_fetch.items() if code in cached}
+
+    fetched = {}
     with ThreadPoolExecutor(max_workers=20) as executor:
-        futures = {executor.submit(process_single_stock, index, row, market_type): index for index, row in df_stage_one.iterrows()}
-        for future in as_completed(futures):
-            index, updated_row = future.result()
-            df_stage_one.loc[index] = updated_row
-
-    df_stage_one['Operating Income / Pretax Income Ratio'] = df_stage_one['Operating Income / Pretax Income Ratio'].apply(lambda x: f"{x*100:.2f}%" if x is not None else "N/A")
-    
-    def determine_qualification(row):
-        # 如果公司代號在"EPS持股"的position欄位中，則設定為'qualified'
-        if str(row['公司代號']) in positions:
-            print(f"公司代號 {row['公司代號']} 符合 EPS 持股的 position 標準，設定為 qualified")
-            return 'qualified'
-        
-        # 白名單代號
-        whitelist = ['2880', '2881', '2882', '2883', '2884', '2885', '2886', '2887', '2888', '2889', '2890', '2891', '2892', '5880']
-
-        # 如果公司代號在白名單中，直接設定為 'qualified'
-        if str(row['公司代號']) in whitelist:
-            return 'qualified'
-
-        # 否則根據原邏輯判斷
-        try:
-            value_float = float(row['Operating Income / Pretax Income Ratio'].rstrip('%'))
-            if 70 <= value_float <= 130:
-                return 'qualified'
-            else:
-                return 'not qualified'
-        except ValueError:
-            return 'not qualified'
-
-    df_stage_one['qualification'] = df_stage_one.apply(determine_qualification, axis=1)
+        futures = {executor.submit(process_single_stock, code, market_type): (index, code) for index, code in to_fetch.items() if code not in cached}
+        for future in metrics.track_completion(futures, 'stage_two'):
+            index, code = futures[future]
+            records[index] = fetched[code] = future.result()
+            if fetched[code]:
+                journal.append(code, fetched[code])
+    saved = {code: record for code, record in fetched.items() if record}
+    incremental.save_records('stage_two', saved, dict.fromkeys(saved, MARKET_NAMES[market_type]))
+
+    results = pd.DataFrame.from_dict(records, orient='index', columns=STAGE_TWO_COLUMNS)
+    df_stage_one = df_stage_one.drop(columns=STAGE_TWO_COLUMNS, errors='ignore').join(results)
+
+    # 比率保持數值 (1.0 即 100%)，取到百分比小數兩位後判斷是否在區間內
+    ratio = pd.to_numeric(df_stage_one['Operating Income / Pretax Income Ratio'], errors='coerce')
+    df_stage_one['Operating Income / Pretax Income Ratio'] = ratio
+    in_range = ratio.round(4).between(*RATIO_RANGE)
+    df_stage_one['qualification'] = np.where(auto_qualified | in_range, 'qualified', 'not qualified')
 
     print("階段二資料抓取與判斷完成")
     return df_stage_one
@@ -177,10 +181,10 @@ def main():
     # 合併上市和上櫃資料
     df_final = pd.concat([df_final_tw, df_final_two])
 
-    # 輸出至CSV
-    output_dir = r"G:\我的雲端硬碟\Horizon\python_stock"
-    output_file = os.path.join(output_dir, "financial_data_stage_two.csv")
-    df_final.to_csv(output_file, index=False, encoding='utf-8-sig')
+    # 輸出至 Parquet 供下一階段讀取，另存一份 CSV 方便檢視
+    output_file = settings.STAGE_TWO_PATH
+    write_stage(df_final, output_file, STAGE_TWO_SCHEMA)
+    export_csv(df_final, settings.STAGE_TWO_EXPORT_PATH, STAGE_TWO_SCHEMA)
     print(f"財務數據已保存到 {output_file}")
 
 if __name__ == "__main__":
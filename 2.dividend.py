@@ -1,56 +1,35 @@
-import yfinance as yf
 import pandas as pd
-import requests
+from dividend_calendar import lookup_next_dividend
+from yahoo_snapshot import get_snapshot
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 import time  # 用來計算運行時間
+import settings
+import incremental
+import checkpoint
+import fundamentals_store
+import metrics
+from stage_io import read_stage, write_stage, STAGE_TWO_SCHEMA, DIVIDEND_STAGE_SCHEMA
 
-# 調整API與stock代號根據「市場類型」判斷
-def fetch_next_dividend_info(stock_code, market_type):
-    if market_type == "上市":
-        twse_url = "https://openapi.twse.com.tw/v1/exchangeReport/TWT48U_ALL"
-    elif market_type == "上櫃":
-        twse_url = "https://openapi.twse.com.tw/v1/exchangeReport/TWT48U_ALL"  # 若有不同API，請在此處更改
-    
-    try:
-        response = requests.get(twse_url)
-        response.raise_for_status()
-        content_type = response.headers.get('Content-Type')
-        if 'application/json' in content_type:
-            data = response.json()
-            df = pd.DataFrame(data)
-
-            df['Code'] = df['Code'].astype(str)
-            stock_code = str(stock_code)  # 確保股票代號是字符串
-            filtered_df = df[df['Code'] == stock_code]
-
-            if not filtered_df.empty:
-                minguo_date_str = filtered_df.iloc[0]['Date']
-                next_ex_div_date = convert_to_western_date(minguo_date_str)
-                next_dividend_amount = float(filtered_df.iloc[0]['CashDividend'])
-                return next_ex_div_date, next_dividend_amount
-    except requests.exceptions.RequestException as e:
-        print(f"抓取API時發生錯誤: {e}")
-    
-    return '無法取得資料', '無法取得資料'
+# 單一執行緒池的上限，所有合格股票共用，由閒置的執行緒依序領取下一檔
+MAX_WORKERS = 16
 
-def convert_to_western_date(minguo_date_str):
-    year = int(minguo_date_str[:3]) + 1911
-    month = int(minguo_date_str[3:5])
-    day = int(minguo_date_str[5:7])
-    return datetime(year, month, day).strftime('%Y-%m-%d')
+# 下一次除息資訊改由全市場除權息預告表的索引查詢，不再每檔股票各自下載
+def fetch_next_dividend_info(stock_code, market_type):
+    return lookup_next_dividend(stock_code)
 
-# 使用yfinance抓取財務數據時根據「市場類型」判斷
+# 使用共用的 Yahoo 資料快照抓取財務數據
 def get_financial_data(stock_code, market_type):
-    if market_type == "上市":
-        stock = yf.Ticker(f"{stock_code}.TW")
-    elif market_type == "上櫃":
-        stock = yf.Ticker(f"{stock_code}.TWO")
+    stock = get_snapshot(stock_code, market_type)
     
     annual_financials = stock.financials
+    fundamentals_store.record_statement(stock_code, annual_financials, ['Diluted EPS', 'Operating Income', 'Pretax Income'], 'A')
+    fundamentals_store.record_series(stock_code, 'Dividends', stock.dividends, 'D')
     available_years = [col.year for col in annual_financials.columns]
     last_year = max(available_years)
 
+    dividends = stock.dividends.resample('YE').sum()
+
     results = {}
     for i in range(4):  # 迴圈處理前四年度的數據
         year = last_year - i
@@ -61,7 +40,6 @@ def get_financial_data(stock_code, market_type):
         except KeyError:
             eps = '無資料'
 
-        dividends = stock.dividends.resample('YE').sum()
         dividend = dividends.loc[dividends.index.year == year]
         dividend = round(dividend.iloc[0], 2) if not dividend.empty else '無資料'
 
@@ -106,34 +84,21 @@ def calculate_payout_ratio(financial_data):
 
     return payout_ratios
 
-# 抓取前一次和最新收盤價根據「市場類型」判斷
+# 抓取前一次除息日 (最新收盤價由 3.calculation 批次下載，這裡不再查詢)
 def get_additional_info(stock_code, market_type):
-    if market_type == "上市":
-        stock = yf.Ticker(f"{stock_code}.TW")
-    elif market_type == "上櫃":
-        stock = yf.Ticker(f"{stock_code}.TWO")
+    stock = get_snapshot(stock_code, market_type)
 
     actions = stock.actions
     ex_dividend_dates = actions.index[actions['Dividends'] > 0]
     last_ex_div_date = ex_dividend_dates[-1].strftime('%Y-%m-%d') if not ex_dividend_dates.empty else '無資料'
 
-    last_close = '無資料'
-    periods = ["1d", "5d", "1mo"]
-    for period in periods:
-        history_data = stock.history(period=period)
-        if not history_data.empty:
-            last_close = round(history_data['Close'].iloc[-1], 2)
-            break
-
-    return last_ex_div_date, last_close
+    return last_ex_div_date
 
-# 抓取最近四個季度的EPS根據「市場類型」判斷
+# 抓取最近四個季度的EPS
 def get_quarterly_eps(stock_code, market_type):
-    if market_type == "上市":
-        stock = yf.Ticker(f"{stock_code}.TW")
-    elif market_type == "上櫃":
-        stock = yf.Ticker(f"{stock_code}.TWO")
+    stock = get_snapshot(stock_code, market_type)
 
+    fundamentals_store.record_statement(stock_code, stock.quarterly_financials, ['Diluted EPS'], 'Q')
     quarterly_financials = stock.quarterly_financials.T
     if 'Diluted EPS' in quarterly_financials.columns:
         diluted_eps_last_4 = [round(val, 2) for val in quarterly_financials['Diluted EPS'].dropna().iloc[:4]]
@@ -146,7 +111,7 @@ def get_quarterly_eps(stock_code, market_type):
 def process_stock_data(stock_code, market_type):
     financial_data = get_financial_data(stock_code, market_type)
     quarterly_eps = get_quarterly_eps(stock_code, market_type)
-    last_ex_div_date, last_close = get_additional_info(stock_code, market_type)
+    last_ex_div_date = get_additional_info(stock_code, market_type)
     next_ex_div_date, next_dividend_amount = fetch_next_dividend_info(stock_code, market_type)
 
     payout_ratios = calculate_payout_ratio(financial_data)
@@ -173,34 +138,41 @@ def process_stock_data(stock_code, market_type):
 
 # 主程式
 def main():
-    # 從CSV文件中讀取「公司代號」與「市場類型」欄位
-    file_path = r'G:\我的雲端硬碟\Horizon\python_stock\financial_data_stage_two.csv'
-    df = pd.read_csv(file_path)
+    # 從階段二的 Parquet 讀取「公司代號」與「市場類型」欄位
+    file_path = settings.STAGE_TWO_PATH
+    df = read_stage(file_path, STAGE_TWO_SCHEMA)
     
-    # 只保留「qualification」為 "qualified" 並且「公司代號」小於等於2500的列
-    qualified_df = df[(df['qualification'] == 'qualified') & (df['公司代號'].astype(int) <= 2500)].copy()
-
-    # 將整個「公司代號」欄位先轉換為字串型態
-    qualified_df['公司代號'] = qualified_df['公司代號'].astype(str)
+    # 只保留「qualification」為 "qualified" 的列 (不再依代號區間拆成多個腳本)
+    qualified_df = df[df['qualification'].isin(['qualified'])].copy()
 
     stock_codes = qualified_df[['公司代號', '市場類型']].values.tolist()
 
-    all_data_list = []
+    # 本次執行中斷前已完成的股票直接取用檢查點；增量模式下，財報期別與除權息預告都沒有變動的股票沿用上次的資料
+    journal = checkpoint.open_journal('dividend')
+    cached = journal.load()
+    reused, _ = incremental.reuse_records('dividend', [stock_code for stock_code, _ in stock_codes if stock_code not in cached])
+    cached.update(reused)
+    cached = {stock_code: cached[stock_code] for stock_code, _ in stock_codes if stock_code in cached}
+    all_data_list = list(cached.values())
+    fetched = {}
 
     # 記錄開始時間
     start_time = time.time()
 
-    # 使用多線程加速處理
-    with ThreadPoolExecutor(max_workers=16) as executor:
-        futures = {executor.submit(process_stock_data, stock_code, market_type): (stock_code, market_type) for stock_code, market_type in stock_codes}
+    # 使用單一執行緒池動態排程：每檔股票各自為一個工作，先做完的執行緒立即接手下一檔
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(process_stock_data, stock_code, market_type): (stock_code, market_type) for stock_code, market_type in stock_codes if stock_code not in cached}
 
-        for future in as_completed(futures):
+        for future in metrics.track_completion(futures, 'dividend'):
             stock_code, market_type = futures[future]
             try:
                 data = future.result()
                 all_data_list.append(data)
+                fetched[stock_code] = data
+                journal.append(stock_code, data)
             except Exception as exc:
                 print(f"{stock_code} 處理時發生錯誤: {exc}")
+    incremental.save_records('dividend', fetched, dict(stock_codes))
 
     # 記錄結束時間
     end_time = time.time()
@@ -211,12 +183,15 @@ def main():
 
     # 將所有股票數據轉換為 DataFrame
     all_data_df = pd.DataFrame(all_data_list)
+    if not all_data_df.empty:
+        # 完成順序不固定，依股票代碼排序讓輸出穩定
+        all_data_df = all_data_df.sort_values(by='股票代碼', key=lambda s: s.astype(int)).reset_index(drop=True)
 
-    # 保存為 XLSX 文件到指定路徑
-    output_path = r'G:\我的雲端硬碟\Horizon\python_stock\qualified_stocks_financial_data_A.xlsx'
-    all_data_df.to_excel(output_path, index=False)
+    # 保存為 Parquet，「無資料」等文字在固定型別下成為空值
+    output_path = settings.DIVIDEND_STAGE_PATH
+    write_stage(all_data_df, output_path, DIVIDEND_STAGE_SCHEMA)
 
-    print("所有股票數據已保存到 'qualified_stocks_financial_data_A.xlsx'")
+    print(f"所有股票數據已保存到 '{output_path}'")
 
 if __name__ == "__main__":
     main()
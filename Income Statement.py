@@ -1,160 +1,134 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from openpyxl import load_workbook
+import multiprocessing
 import os
-import openpyxl
-import re  # 加入正則表達式
-from openpyxl.utils import get_column_letter
-from copy import copy
-from openpyxl.cell import MergedCell
-
-# 營收資料抓取函數
-def fetch_revenue(year, month, stock_code, mode='a'):
-    republic_year = year - 1911  # 西元轉民國年
-    if mode == 'a':  # 上市公司
-        url = f'https://mopsov.twse.com.tw/nas/t21/sii/t21sc03_{republic_year}_{month}_0.html'
-    elif mode == 'b':  # 上櫫公司
-        url = f'https://mopsov.twse.com.tw/nas/t21/otc/t21sc03_{republic_year}_{month}_0.html'
-    
-    response = requests.get(url)
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import settings
+import metrics
+from concurrent_fetch import fetch_all
+from revenue_table import load_revenue_tables
+from html_parsing import parse_statement_sections
+from statement_workbook import write_statement_workbook
+from stage_io import read_stage, STAGE_TWO_SCHEMA
+
+START_YEAR = 2021
+END_YEAR = 2025
+TARGET_CODES = ['4000', '5000', '6000', '6500', '6900', '7100', '7010', '7020', '7050', '7060', '7000', '7900', '7950', '8000', '8200', '8300', '8500', '8610', '8710', '8720', '9750', '9850']
+
+# 市場類型對應的 (營收 mode, 財報 mode)
+MARKET_MODES = {'上市': ('a', 'A'), '上櫃': ('b', 'B')}
+
+# 批次模式同時抓取資料的公司數，以及寫入Excel的子行程數
+FETCH_WORKERS = 8
+WRITE_WORKERS = min(4, os.cpu_count() or 1)
+
+# 寫檔子行程以 spawn 啟動：經由 0.mainprocess 執行時，配息階段的執行緒仍在同一個行程中運作，
+# fork 會把其他執行緒當下持有的鎖 (stdout、HTTP 快取的 sqlite 連線等) 一起複製到子行程而造成鎖死
+WRITE_CONTEXT = multiprocessing.get_context('spawn')
+
+# 從全市場月營收表查詢多個月份的營收，回傳 {(year, month): 營收}
+def fetch_revenues(periods, stock_code, mode='a'):
+    tables = load_revenue_tables(periods, mode)
+    revenues = {}
+    for period in periods:
+        revenue = tables[period].get(str(stock_code))
+        revenues[period] = None if revenue is None or pd.isna(revenue) else int(revenue)
+    return revenues
+
+# 財務報表頁面網址
+def financial_statement_url(stock_code, year, quarter, mode):
+    if mode == 'A':  # 上市公司
+        return f"https://mopsov.twse.com.tw/server-java/t164sb01?step=3&SYEAR={year}&file_name=tifrs-fr1-m1-ci-cr-{stock_code}-{year}Q{quarter}.html"
+    elif mode == 'B':  # 上櫃公司
+        return f"https://mopsov.twse.com.tw/server-java/t164sb01?step=1&CO_ID={stock_code}&SYEAR={year}&SSEASON={quarter}&REPORT_ID=A"
+
+# 從 section 的表格列中取出目標代號，回傳 [[代號, 會計項目, 數值], ...]
+def parse_section(rows, target_codes):
+    data = []
+    for row in rows:
+        if len(row) < 3:
+            continue
+        code, account_item, value = row
+
+        if "(" in value and ")" in value:
+            value = "-" + value.replace("(", "").replace(")", "")
+        try:
+            value = float(value.replace(',', ''))
+            if code in ['9750', '9850']:
+                value = round(value, 2)  # 9750 和 9850 保留兩位小數
+            else:
+                value = int(value)  # 其他代號轉換為整數
+        except ValueError:
+            value = None
+
+        if code in target_codes:
+            data.append([code, account_item, value])
+    return data
+
+# 一份財報頁面只解析一次，再從中取出多個 section，回傳 {section_id: 資料列}
+def parse_financial_statement(response, sections):
     response.encoding = 'big5'
-    soup = BeautifulSoup(response.text, 'html.parser')
-    tables = soup.find_all('table')
-    for table in tables:
-        rows = table.find_all('tr')
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) > 0 and cells[0].get_text(strip=True) == stock_code:
-                revenue = cells[2].get_text(strip=True).replace(',', '')
-                return int(revenue) if revenue.isdigit() else None
-    return None  # 返回 None 表示該月份無數據
-
-# 抓取財務報表資料的共通函數 (StatementOfComprehensiveIncome 或 BalanceSheet)
-def fetch_financial_data(stock_code, years, target_codes, section_id, mode, specific_quarter=None, need_url=True):
-    dfs = []
-    urls = [] if need_url else None  # 用來儲存每個季度的 URL，如果不需要 URL，則設為 None
-    last_quarter = None  # 用來存儲最後抓取的季度
+    section_rows = parse_statement_sections(response.text, list(sections))
+    return {section_id: parse_section(section_rows[section_id], target_codes) for section_id, target_codes in sections.items()}
 
+# 抓取財務報表資料的共通函數，每個季度只下載一次頁面，同時取出多個 section
+# (例如 StatementOfComprehensiveIncome 與 BalanceSheet)
+def fetch_financial_data(stock_code, years, sections, mode):
+    """
+    :param sections: {section_id: 目標代號列表}
+    :return: {section_id: {year_quarter: (url, 該季度的 DataFrame)}}，只包含有資料的季度
+    """
+    periods = []
     for year in years:
         for quarter in range(1, 5):
-            year_quarter = f"{year}Q{quarter}"
+            periods.append((f"{year}Q{quarter}", financial_statement_url(stock_code, year, quarter, mode)))
+
+    # 所有季度同時發出請求，再依季度順序解析
+    # 只有真的含有報表內容的頁面才永久快取，尚未公告的季度下次仍會重新抓取
+    markers = [section_id.encode() for section_id in sections]
+    cache_if = lambda r: any(marker in r.content for marker in markers)
+    responses = fetch_all([(url, {'cache_if': cache_if}) for _, url in periods])
+
+    results = {section_id: {} for section_id in sections}
+    for (year_quarter, url), response in zip(periods, responses):
+        if isinstance(response, Exception):
+            print(f"Failed to fetch data for {year_quarter}: {str(response)}")
+            continue
+        if response.status_code != 200:
+            continue
+
+        for section_id, data in parse_financial_statement(response, sections).items():
+            if len(data) > 0:
+                results[section_id][year_quarter] = (url, pd.DataFrame(data, columns=['代號', '會計項目', year_quarter]))
+    return results
+
+# 將同一個 section 各季度的資料合併成一張表，回傳 (合併後的 DataFrame, 最後一個有資料的季度)
+def merge_quarters(quarters, need_url=True):
+    if not quarters:
+        return pd.DataFrame(), None  # 空的DataFrame 和 None
 
-            if specific_quarter and year_quarter != specific_quarter:
-                continue  # 如果指定了具體季度，跳過其他季度
+    year_quarters = list(quarters)  # 依季度先後排列
+    urls = [quarters[year_quarter][0] for year_quarter in year_quarters]
+    dfs = [quarters[year_quarter][1] for year_quarter in year_quarters]
 
-            if mode == 'A':  # 上市公司
-                url = f"https://mopsov.twse.com.tw/server-java/t164sb01?step=3&SYEAR={year}&file_name=tifrs-fr1-m1-ci-cr-{stock_code}-{year}Q{quarter}.html"
-            elif mode == 'B':  # 上櫃公司
-                url = f"https://mopsov.twse.com.tw/server-java/t164sb01?step=1&CO_ID={stock_code}&SYEAR={year}&SSEASON={quarter}&REPORT_ID=A"
+    final_df = dfs[0]
+    for df in dfs[1:]:
+        final_df = pd.merge(final_df, df, on=['代號', '會計項目'], how='outer')
 
-            try:
-                response = requests.get(url, timeout=5)
-                if response.status_code == 200:
-                    response.encoding = 'big5'
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    div = soup.find('div', id=section_id)  # 動態查找 section
-
-                    if div is None:
-                        continue  # 如果没有找到 div，跳过当前季度
-
-                    table = div.find_next('table')
-                    rows = table.find_all('tr')
-                    data = []
-                    for row in rows:
-                        cols = row.find_all('td')
-                        if not cols:
-                            continue
-                        code = cols[0].text.strip()
-                        account_item = cols[1].text.strip()
-                        value = cols[2].text.strip()
-
-                        if "(" in value and ")" in value:
-                            value = "-" + value.replace("(", "").replace(")", "")
-                        try:
-                            value = float(value.replace(',', ''))
-                            if code in ['9750', '9850']:
-                                value = round(value, 2)  # 9750 和 9850 保留兩位小數
-                            else:
-                                value = int(value)  # 其他代號轉換為整數
-                        except ValueError:
-                            value = None
-
-                        if code in target_codes:
-                            data.append([code, account_item, value])
-
-                    if len(data) > 0:
-                        quarter_df = pd.DataFrame(data, columns=['代號', '會計項目', year_quarter])
-                        dfs.append(quarter_df)
-                        if need_url:
-                            urls.append(url)  # 將當前 URL 加入列表
-                        last_quarter = year_quarter  # 更新最後抓取的季度
-
-            except requests.RequestException as e:
-                print(f"Failed to fetch data for {year_quarter}: {str(e)}")
-
-    if dfs:
-        final_df = dfs[0]
-        for df in dfs[1:]:
-            final_df = pd.merge(final_df, df, on=['代號', '會計項目'], how='outer')
-
-        # 如果需要URL，則在資料的最後一列添加 URL 列
-        if need_url:
-            url_row = ['URL', ''] + urls  # 第一列為 'URL'
-            final_df.loc[len(final_df)] = url_row  # 在最後一列插入URL
-
-        return final_df, last_quarter
-    else:
-        return pd.DataFrame(), None  # 空的DataFrame 和 None
+    # 如果需要URL，則在資料的最後一列添加 URL 列
+    if need_url:
+        url_row = ['URL', ''] + urls  # 第一列為 'URL'
+        final_df.loc[len(final_df)] = url_row  # 在最後一列插入URL
+
+    return final_df, year_quarters[-1]
 
 # 自動生成連續年份的功能
 def generate_year_range(start_year, end_year):
     return list(range(start_year, end_year + 1))
 
-# 匯入其他Excel檔案的指定工作表
-def import_sheets_from_excel(file_path, sheets, writer):
-    wb = load_workbook(file_path)
-    for sheet_name in sheets:
-        if sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            # 將工作表內容轉換為 DataFrame
-            data = ws.values
-            columns = next(data)
-            df = pd.DataFrame(data, columns=columns)
-            # 將 DataFrame 寫入目標文件的工作表
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-def apply_formatting(src_ws, target_ws):
-    for row in src_ws.iter_rows():
-        for cell in row:
-            if isinstance(cell, MergedCell):  # 檢查是否為合併單元格
-                continue  # 如果是合併單元格，跳過此單元格
-            target_cell = target_ws.cell(row=cell.row, column=cell.column)
-            # 單獨設置字體、填充、邊框、對齊和數字格式
-            if cell.has_style:
-                target_cell.font = copy(cell.font)
-                target_cell.fill = copy(cell.fill)
-                target_cell.border = copy(cell.border)
-                target_cell.alignment = copy(cell.alignment)
-                target_cell.number_format = cell.number_format
-
-    # 設置列寬
-    for col_letter, col_dim in src_ws.column_dimensions.items():
-        target_ws.column_dimensions[col_letter].width = col_dim.width
-
-def freeze_panes_in_worksheet(target_wb, sheet_name, freeze_cell):
-    """
-    凍結指定工作表的窗格。
-    :param target_wb: openpyxl 加載的工作簿
-    :param sheet_name: 工作表名稱
-    :param freeze_cell: 凍結窗格的起始單元格，例如 "C3"
-    """
-    if sheet_name in target_wb.sheetnames:
-        ws = target_wb[sheet_name]
-        ws.freeze_panes = freeze_cell
-
-# 整合多個報表資料並將結果寫入不同工作表
-def combine_revenue_and_financial_data(stock_code, start_year, end_year, target_codes, mode_revenue='a', mode_financial='A'):
+# 抓取並整理單一公司的營收與財報資料，回傳 (檔案路徑, 綜合損益表, 資產負債表, 營收)
+def build_statement_data(stock_code, start_year, end_year, target_codes, mode_revenue='a', mode_financial='A'):
     # 生成連續年份範圍
     years = generate_year_range(start_year, end_year)
 
@@ -162,79 +136,125 @@ def combine_revenue_and_financial_data(stock_code, start_year, end_year, target_
     revenue_data = {'月份': [], '當月營收': []}
     last_month = None  # 用來存儲最後抓取的月份
 
-    for year in years:
-        for month in range(1, 13):
-            revenue = fetch_revenue(year, month, stock_code, mode_revenue)
-            if revenue is not None:
-                year_month = int(f"{year}{str(month).zfill(2)}")
-                revenue_data['月份'].append(year_month)
-                revenue_data['當月營收'].append(revenue)
-                last_month = year_month  # 更新最後抓取的月份
-            else:
-                revenue_data['月份'].append("")
-                revenue_data['當月營收'].append("")
+    months = [(year, month) for year in years for month in range(1, 13)]
+    revenues = fetch_revenues(months, stock_code, mode_revenue)
+    for year, month in months:
+        revenue = revenues[(year, month)]
+        if revenue is not None:
+            year_month = int(f"{year}{str(month).zfill(2)}")
+            revenue_data['月份'].append(year_month)
+            revenue_data['當月營收'].append(revenue)
+            last_month = year_month  # 更新最後抓取的月份
+        else:
+            revenue_data['月份'].append("")
+            revenue_data['當月營收'].append("")
 
     revenue_df = pd.DataFrame(revenue_data)
 
-    # 2. 抓取財務報表資料 - 綜合損益表
-    income_df, last_quarter = fetch_financial_data(stock_code, years, target_codes, 'StatementOfComprehensiveIncome', mode_financial)
-
-    # 3. 抓取財務報表資料 - 只抓取綜合損益表成功的最後一個季度的資產負債表 (代號 3110)，且不需要URL
-    if last_quarter:
-        balance_sheet_df, _ = fetch_financial_data(stock_code, years, ['3110'], 'BalanceSheet', mode_financial, specific_quarter=last_quarter, need_url=False)
+    # 2. 抓取財務報表資料 - 綜合損益表與資產負債表 (代號 3110) 來自同一份頁面，每個季度只下載一次
+    statements = fetch_financial_data(stock_code, years, {
+        'StatementOfComprehensiveIncome': target_codes,
+        'BalanceSheet': ['3110'],
+    }, mode_financial)
+    income_df, last_quarter = merge_quarters(statements['StatementOfComprehensiveIncome'])
+
+    # 3. 資產負債表只取綜合損益表成功的最後一個季度，且不需要URL
+    balance_quarters = statements['BalanceSheet']
+    if last_quarter and last_quarter in balance_quarters:
+        balance_sheet_df, _ = merge_quarters({last_quarter: balance_quarters[last_quarter]}, need_url=False)
     else:
         balance_sheet_df = pd.DataFrame()  # 如果沒有成功抓取綜合損益表，則返回空的DataFrame
 
     # 4. 動態生成檔案名稱並指定保存路徑
-    folder_path = r'G:\我的雲端硬碟\Horizon\python_stock\stocks'  # 指定目標資料夾
+    folder_path = settings.STATEMENTS_DIR  # 指定目標資料夾
     if last_quarter and last_month:
         filename = f"{stock_code}_is_{last_quarter}_{last_month}.xlsx"
     else:
         filename = f"{stock_code}_is_combined_data.xlsx"  # 如果無資料，則使用預設名稱
     file_path = os.path.join(folder_path, filename)  # 完整檔案路徑
 
-    # 5. 將多個報表寫入同一Excel文件，不同工作表
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        # 先寫入 Financial Statements
-        income_df.to_excel(writer, index=False, sheet_name='Financial Statements')
-
-        # 寫入 Balance Sheet
-        if not balance_sheet_df.empty:
-            balance_sheet_df.to_excel(writer, index=False, sheet_name='Balance Sheet')
+    return file_path, income_df, balance_sheet_df, revenue_df
 
-        # 再寫入 Revenue
-        revenue_df.to_excel(writer, index=False, sheet_name='Revenue')
+# 整合多個報表資料並將結果寫入不同工作表
+def combine_revenue_and_financial_data(stock_code, start_year, end_year, target_codes, mode_revenue='a', mode_financial='A'):
+    file_path, income_df, balance_sheet_df, revenue_df = build_statement_data(
+        stock_code, start_year, end_year, target_codes, mode_revenue, mode_financial)
 
-        # 匯入其他Excel檔案的指定工作表
-        import_file_path = r'G:\我的雲端硬碟\Horizon\python_stock\1537_is_2024Q3_202501_formation.xlsx'
-        import_sheets = ['★IS(IFRS項目)', 'breakdown', 'Financial Statements_adj']
-        import_sheets_from_excel(import_file_path, import_sheets, writer)
+    # 5~6. 寫入Excel並套用範本格式
+    write_statement_workbook(file_path, income_df, balance_sheet_df, revenue_df)
 
-    # 6. 複製格式到目標檔案
-    source_wb = load_workbook(r'G:\我的雲端硬碟\Horizon\python_stock\1537_is_2024Q3_202501_formation.xlsx')
-    target_wb = load_workbook(file_path)
+    print(f"資料已成功合併並輸出到 '{file_path}'，且格式已套用至「★IS(IFRS項目)」sheet")
 
-    # 遍歷來源檔案中的所有工作表
-    for sheet_name in source_wb.sheetnames:
-        if sheet_name in target_wb.sheetnames:
-            # 獲取來源工作表和目標工作表
-            source_ws = source_wb[sheet_name]
-            target_ws = target_wb[sheet_name]
-            # 將來源表格的格式應用到目標工作表
-            apply_formatting(source_ws, target_ws)
+def combine_statements_batch(companies, start_year, end_year, target_codes):
+    """
+    批次建立多家公司的財報檔。
+    資料抓取由執行緒完成 (共用 HTTP 連線池、回應快取與全市場月營收表)，
+    Excel 的寫入與格式套用交給有上限的子行程。
+    :param companies: [(公司代號, 市場類型), ...]，市場類型為 "上市" 或 "上櫃"
+    :return: 成功輸出的檔案路徑列表
+    """
+    start = time.perf_counter()
+    os.makedirs(settings.STATEMENTS_DIR, exist_ok=True)
 
-            # 對「★IS(IFRS項目)」套用凍結窗格
-            if sheet_name == "★IS(IFRS項目)":
-                freeze_panes_in_worksheet(target_wb, sheet_name, "C3")
+    # 先載入兩個市場所有月份的營收表，避免多個執行緒重複下載同一頁
+    years = generate_year_range(start_year, end_year)
+    months = [(year, month) for year in years for month in range(1, 13)]
+    for mode_revenue in sorted({MARKET_MODES[market_type][0] for _, market_type in companies}):
+        load_revenue_tables(months, mode_revenue)
+
+    written = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetch_executor, \
+            ProcessPoolExecutor(max_workers=WRITE_WORKERS, mp_context=WRITE_CONTEXT) as write_executor:
+        fetch_futures = {
+            fetch_executor.submit(build_statement_data, stock_code, start_year, end_year, target_codes, *MARKET_MODES[market_type]): stock_code
+            for stock_code, market_type in companies
+        }
+
+        # 資料一抓完就交給子行程寫檔，不必等其他公司
+        write_futures = {}
+        for future in metrics.track_completion(fetch_futures, 'statement_fetch'):
+            stock_code = fetch_futures[future]
+            try:
+                write_futures[write_executor.submit(write_statement_workbook, *future.result())] = stock_code
+            except Exception as exc:
+                print(f"{stock_code} 抓取財報時發生錯誤: {exc}")
 
-    # 保存更新後的目標檔案
-    target_wb.save(file_path)
+        for future in metrics.track_completion(write_futures, 'statement_write'):
+            stock_code = write_futures[future]
+            try:
+                file_path = future.result()
+                written.append(file_path)
+                print(f"資料已成功合併並輸出到 '{file_path}'")
+            except Exception as exc:
+                print(f"{stock_code} 寫入財報檔時發生錯誤: {exc}")
+
+    elapsed = time.perf_counter() - start
+    per_minute = len(written) / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"共完成 {len(written)}/{len(companies)} 家公司，耗時 {elapsed:.2f} 秒，約每分鐘 {per_minute:.1f} 家")
+    return written
+
+# 讀取管線階段二的合格股票清單，回傳 [(公司代號, 市場類型), ...]
+def load_qualified_companies():
+    df = read_stage(settings.STAGE_TWO_PATH, STAGE_TWO_SCHEMA)
+    qualified_df = df[df['qualification'].isin(['qualified'])]
+    return list(qualified_df[['公司代號', '市場類型']].itertuples(index=False, name=None))
+
+# 主程式：命令列帶入公司代號時只處理這些公司，否則處理管線產出的合格清單
+def main(stock_codes=None):
+    if stock_codes is None:
+        stock_codes = [arg for arg in sys.argv[1:] if arg.isdigit()]
+
+    if stock_codes:
+        # 由階段二的清單判斷市場類型，查不到時視為上市公司
+        try:
+            market_types = dict(load_qualified_companies())
+        except FileNotFoundError:
+            market_types = {}
+        companies = [(code, market_types.get(code, '上市')) for code in stock_codes]
+    else:
+        companies = load_qualified_companies()
 
-    print(f"資料已成功合併並輸出到 '{file_path}'，且格式已套用至「★IS(IFRS項目)」sheet")
+    combine_statements_batch(companies, START_YEAR, END_YEAR, TARGET_CODES)
 
-# 使用示例
-stock_code = '2330'
-start_year = 2021
-end_year = 2025
-target_codes = ['4000', '5000', '6000', '6500', '6900', '7100', '7010', '7020', '7050', '7060', '7000', '7900', '7950', '8000', '8200', '8300', '8500', '8610', '8710', '8720', '9750', '9850']
-combine_revenue_and_financial_data(stock_code, start_year, end_year, target_codes, mode_revenue='a', mode_financial='A')
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+比較 HTML 解析後端 (BeautifulSoup / lxml) 在 ISIN、月營收、財報頁面上的速度，並確認輸出一致。
+
+用法:
+    python benchmarks/bench_html_parsing.py --export samples   # 從 HTTP 快取匯出樣本頁面
+    python benchmarks/bench_html_parsing.py samples --repeat 5
+
+樣本檔名以 isin / revenue / statement 開頭，內容為已解碼的 UTF-8 HTML。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_cache
+from html_parsing import BACKENDS, parse_isin_codes, parse_revenue_rows, parse_statement_sections
+
+STATEMENT_SECTIONS = ['StatementOfComprehensiveIncome', 'BalanceSheet']
+
+# 每種頁面對應的快取網址片段、頁面編碼與解析函數
+PAGE_TYPES = {
+    'isin': ('isin.twse.com.tw', None, lambda html, backend: parse_isin_codes(html, backend)),
+    'revenue': ('/nas/t21/', 'big5', lambda html, backend: parse_revenue_rows(html, backend)),
+    'statement': ('/server-java/t164sb01', 'big5', lambda html, backend: parse_statement_sections(html, STATEMENT_SECTIONS, backend)),
+}
+
+def export_samples(samples_dir, limit):
+    os.makedirs(samples_dir, exist_ok=True)
+    http_cache.set_offline()
+    for page_type, (pattern, encoding, _) in PAGE_TYPES.items():
+        for i, url in enumerate(http_cache.cached_urls(pattern)[:limit]):
+            response = http_cache.cached_get(url)
+            if encoding:
+                response.encoding = encoding
+            path = os.path.join(samples_dir, f'{page_type}_{i:03d}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(response.text)
+            print(f"{url} -> {path}")
+
+def run_benchmark(samples_dir, repeat):
+    print(f"{'檔案':<28}{'大小(KB)':>10}" + ''.join(f"{backend + '(ms)':>14}" for backend in BACKENDS) + f"{'一致':>8}")
+    totals = {backend: 0.0 for backend in BACKENDS}
+    mismatches = 0
+
+    for name in sorted(os.listdir(samples_dir)):
+        page_type = name.split('_')[0]
+        if page_type not in PAGE_TYPES:
+            continue
+        with open(os.path.join(samples_dir, name), encoding='utf-8') as f:
+            html = f.read()
+        parse = PAGE_TYPES[page_type][2]
+
+        outputs = {}
+        timings = {}
+        for backend in BACKENDS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs[backend] = parse(html, backend)
+            timings[backend] = (time.perf_counter() - start) / repeat * 1000
+            totals[backend] += timings[backend]
+
+        identical = all(outputs[backend] == outputs['bs4'] for backend in BACKENDS)
+        mismatches += not identical
+        print(f"{name:<28}{len(html.encode('utf-8')) / 1024:>10.1f}"
+              + ''.join(f"{timings[backend]:>14.2f}" for backend in BACKENDS)
+              + f"{'是' if identical else '否':>8}")
+
+    print(f"{'合計':<28}{'':>10}" + ''.join(f"{totals[backend]:>14.2f}" for backend in BACKENDS))
+    if mismatches:
+        print(f"⚠️ 有 {mismatches} 個樣本的解析結果與 bs4 不一致")
+    return mismatches == 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('samples_dir')
+    parser.add_argument('--export', action='store_true', help='從 HTTP 快取匯出樣本頁面到 samples_dir')
+    parser.add_argument('--limit', type=int, default=5, help='每種頁面匯出的數量上限')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.export:
+        export_samples(args.samples_dir, args.limit)
+    elif not run_benchmark(args.samples_dir, args.repeat):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+以錄製的回應離線重跑整條管線 (1.range、2.dividend、3.calculation、Income Statement.py)，
+回報每個階段的耗時、處理筆數與每秒筆數，用來比較程式修改前後的速度，不受網路與節流影響。
+
+用法:
+    python benchmarks/bench_pipeline.py --record --fixtures fixtures   # 連線執行一次並保存所有回應
+    python benchmarks/bench_pipeline.py --fixtures fixtures --repeat 3 --output bench.json
+
+錄製時會一併保存手動維護的 Excel (LHF_ADDITIONAL_DATA 等) 與財報範本，重播時只需要 fixtures 資料夾。
+每次執行都在新的工作資料夾 (LHF_OUTPUT_DIR) 中進行，HTTP 快取、檢查點與增量狀態都從空的開始。
+回應以網址為鍵值，網址中含有日期的請求 (例如最新月份的月營收) 需要在錄製當天 (或同一個月) 重播。
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import settings
+
+# 錄製時一併保存的輸入檔：(環境變數, 原本的路徑)；範本沒有對應的環境變數，固定放在 LHF_OUTPUT_DIR
+INPUT_FILES = {
+    'additional_data.xlsx': ('LHF_ADDITIONAL_DATA', settings.ADDITIONAL_DATA_PATH),
+    'special_period_revenue.xlsx': ('LHF_SPECIAL_PERIOD_REVENUE', settings.SPECIAL_PERIOD_REVENUE_PATH),
+    os.path.basename(settings.STATEMENT_TEMPLATE_PATH): (None, settings.STATEMENT_TEMPLATE_PATH),
+}
+
+def save_inputs(fixture_dir):
+    files_dir = os.path.join(fixture_dir, 'files')
+    os.makedirs(files_dir, exist_ok=True)
+    for name, (_, source) in INPUT_FILES.items():
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(files_dir, name))
+        else:
+            print(f"⚠️ 找不到 {source}，未保存")
+
+def prepare_workdir(fixture_dir, workdir, mode, run_id):
+    """建立空的工作資料夾並設定環境變數，必須在載入其他模組之前呼叫"""
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.update({
+        'LHF_REPLAY': mode,
+        'LHF_FIXTURE_DIR': fixture_dir,
+        'LHF_OUTPUT_DIR': workdir,
+        'LHF_RUN_ID': run_id,
+        'LHF_INCREMENTAL': '0',
+        'LHF_HTTP_OFFLINE': '0',
+    })
+    for name, (env, _) in INPUT_FILES.items():
+        source = os.path.join(fixture_dir, 'files', name)
+        if not os.path.exists(source):
+            continue
+        target = os.path.join(workdir, name)
+        shutil.copyfile(source, target)
+        if env:
+            os.environ[env] = target
+    importlib.reload(settings)
+
+def count_rows(path):
+    import pandas as pd
+    return len(pd.read_parquet(path)) if os.path.exists(path) else 0
+
+def count_report_rows(path):
+    from openpyxl import load_workbook
+    if not os.path.exists(path):
+        return 0
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return max(workbook.active.max_row - 1, 0)
+    finally:
+        workbook.close()
+
+def count_files(directory):
+    return len(os.listdir(directory)) if os.path.isdir(directory) else 0
+
+def run_once(statements):
+    """在目前的行程中依序執行各階段，回傳 {階段: {'seconds', 'rows', 'rows_per_second'}}"""
+    spec = importlib.util.spec_from_file_location('mainprocess', os.path.join(REPO_DIR, '0.mainprocess.py'))
+    mainprocess = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mainprocess)
+    stages = mainprocess.STAGES
+
+    # 各階段的處理筆數：階段二與配息階段為輸出列數，報表為資料列數，財報為輸出的檔案數
+    plan = [
+        ('1.range', lambda module: module.main(), lambda: count_rows(settings.STAGE_TWO_PATH)),
+        ('2.dividend', lambda module: module.main(), lambda: count_rows(settings.DIVIDEND_STAGE_PATH)),
+        ('3.calculation', lambda module: module.main(), lambda: count_report_rows(settings.REPORT_PATH)),
+    ]
+    if statements:
+        # 明確指定公司代號，不讀取命令列參數
+        plan.append(('statements',
+                     lambda module: module.main([code for code, _ in module.load_qualified_companies()[:statements]]),
+                     lambda: count_files(settings.STATEMENTS_DIR)))
+
+    results = {}
+    for name, run, rows in plan:
+        module = mainprocess.load_stage_module(name, stages[name]['script'])
+        start = time.perf_counter()
+        run(module)
+        seconds = time.perf_counter() - start
+        n = rows()
+        results[name] = {'seconds': round(seconds, 3), 'rows': n,
+                         'rows_per_second': round(n / seconds, 2) if seconds > 0 else None}
+    return results
+
+def print_results(results):
+    print(f"{'階段':<16}{'秒數':>10}{'筆數':>8}{'每秒筆數':>12}")
+    for name, result in results.items():
+        rate = result['rows_per_second']
+        print(f"{name:<16}{result['seconds']:>10.2f}{result['rows']:>8}{'' if rate is None else f'{rate:>12.2f}'}")
+    print(f"{'合計':<16}{sum(result['seconds'] for result in results.values()):>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', required=True, help='錄製資料的資料夾')
+    parser.add_argument('--record', action='store_true', help='連線執行並保存所有回應')
+    parser.add_argument('--repeat', type=int, default=1, help='重播的次數 (錄製時固定為 1)')
+    parser.add_argument('--statements', type=int, default=5, help='建立財報檔的公司數，0 表示略過 Income Statement.py')
+    parser.add_argument('--workdir', help='工作資料夾，預設為暫存資料夾')
+    parser.add_argument('--output', help='把結果寫成 JSON')
+    # 內部使用：在子行程中執行一次並以 JSON 回報結果
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    fixture_dir = os.path.abspath(args.fixtures)
+    mode = 'record' if args.record else 'replay'
+
+    if args.child:
+        prepare_workdir(fixture_dir, os.path.abspath(args.workdir), mode, f'bench-{os.getpid()}')
+        results = run_once(args.statements)
+        print('BENCH_RESULT ' + json.dumps(results, ensure_ascii=False))
+        return
+
+    if args.record:
+        save_inputs(fixture_dir)
+    elif not os.path.isdir(fixture_dir):
+        parser.error(f"找不到錄製資料 {fixture_dir}，請先以 --record 執行")
+
+    # 每次都在新的子行程與新的工作資料夾中執行，避免模組狀態與快取影響下一次的計時
+    runs = []
+    for i in range(1 if args.record else args.repeat):
+        workdir = args.workdir and os.path.join(os.path.abspath(args.workdir), f'run{i + 1}')
+        workdir = workdir or tempfile.mkdtemp(prefix='lhf_bench_')
+        command = [sys.executable, os.path.abspath(__file__), '--fixtures', fixture_dir,
+                   '--statements', str(args.statements), '--workdir', workdir, '--child']
+        if args.record:
+            command.append('--record')
+        completed = subprocess.run(command, stdout=subprocess.PIPE, text=True, encoding='utf-8',
+                                   env=dict(os.environ, PYTHONIOENCODING='utf-8'))
+        lines = completed.stdout.splitlines()
+        for line in lines:
+            if not line.startswith('BENCH_RESULT '):
+                print(line)
+        result_lines = [line for line in lines if line.startswith('BENCH_RESULT ')]
+        if completed.returncode != 0 or not result_lines:
+            sys.exit(f"第 {i + 1} 次執行失敗 (結束代碼 {completed.returncode})")
+        results = json.loads(result_lines[-1][len('BENCH_RESULT '):])
+        print(f"第 {i + 1} 次 ({'錄製' if args.record else '重播'})，工作資料夾 {workdir}")
+        print_results(results)
+        runs.append(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'mode': mode, 'fixtures': fixture_dir, 'runs': runs}, f, ensure_ascii=False, indent=2)
+        print(f"結果已保存到 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+在大型合成資料上測試 scoring.score 的速度，並與原本逐列 apply 的計算比對結果。
+
+用法:
+    python benchmarks/bench_scoring.py --rows 200000 --repeat 3
+    python benchmarks/bench_scoring.py --rows 50000 --price-shift -0.1 0 0.1   # 不同股價情境
+
+--legacy-rows 控制原本逐列計算所用的列數 (逐列計算很慢，預設只取前 20000 列比對)。
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import score, QUARTERLY_EPS_COLUMNS, PAYOUT_COLUMNS
+
+OUTPUT_COLUMNS = ['NDD', 'month', 'Last 4Q EPS', 'EPS+', 'M配息率', '預估配息', '支撐', '預期報酬', '預期月報酬']
+
+def synthetic_frame(rows, seed=0):
+    """與 3.calculation 合併手動List 後相同欄位的合成資料，包含各種空值組合"""
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp(date.today())
+
+    def sometimes(values, ratio):
+        return np.where(rng.random(rows) < ratio, values, np.nan)
+
+    def dates(offset_low, offset_high, ratio):
+        offsets = pd.to_timedelta(rng.integers(offset_low, offset_high, rows), unit='D')
+        return pd.Series(today + offsets).where(rng.random(rows) < ratio)
+
+    df = pd.DataFrame({'股票代碼': [str(1000 + i) for i in range(rows)]})
+    for col in QUARTERLY_EPS_COLUMNS:
+        df[col] = sometimes(rng.normal(1.5, 2.0, rows).round(2), 0.9)
+    df['前1年度 EPS'] = sometimes(rng.normal(5, 4, rows).round(2), 0.9)
+    for col in PAYOUT_COLUMNS:
+        df[col] = sometimes(rng.uniform(0, 1.4, rows).round(4), 0.8)
+    df['前一次除息日'] = dates(-500, 0, 0.85)
+    df['下一次除息日'] = dates(-30, 200, 0.3)
+    # 部分股票的前一次與下一次除息日相同
+    same = rng.random(rows) < 0.05
+    df.loc[same, '下一次除息日'] = df.loc[same, '前一次除息日']
+    df['下一次除息金額'] = np.where(df['下一次除息日'].notna(), rng.uniform(0.5, 10, rows).round(2), np.nan)
+    df['EPS'] = sometimes(rng.normal(5, 3, rows).round(2), 0.1)
+    df['配息率'] = sometimes(rng.uniform(0.3, 1.0, rows).round(2), 0.1)
+    df['下次配息時間'] = dates(-100, 300, 0.1)
+    df['下次配息金額'] = sometimes(rng.uniform(0.5, 8, rows).round(2), 0.05)
+    df['support'] = sometimes(rng.uniform(0.03, 0.08, rows).round(3), 0.2)
+    df['最新收盤價'] = sometimes(rng.uniform(10, 1000, rows).round(2), 0.97)
+    return df
+
+def legacy_score(df):
+    """原本 calculate_and_combine 中逐列 apply 的計算 (配發率已是小數)"""
+    df = df.copy()
+    df['前一次除息日'] = pd.to_datetime(df['前一次除息日'], format='%Y-%m-%d', errors='coerce').dt.date
+    df['下一次除息日'] = pd.to_datetime(df['下一次除息日'], format='%Y-%m-%d', errors='coerce').dt.date
+    df.loc[df['前一次除息日'] == df['下一次除息日'], ['下一次除息日', '下一次除息金額']] = [pd.NaT, np.nan]
+
+    df['NDD'] = np.where(df['下次配息時間'].notna(), df['下次配息時間'],
+                np.where(df['下一次除息日'].notna(), df['下一次除息日'],
+                np.where(df['前一次除息日'].notna(), df['前一次除息日'] + pd.DateOffset(days=365), pd.NaT)))
+    df['NDD'] = pd.to_datetime(df['NDD']).dt.date
+    today = date.today()
+    df['NDD'] = df['NDD'].apply(lambda x: x + pd.DateOffset(days=365) if pd.notna(x) and x < today else x)
+    df['NDD'] = pd.to_datetime(df['NDD']).dt.date
+    today = pd.to_datetime(today)
+    df['month'] = df['NDD'].apply(lambda x: round((pd.to_datetime(x) - today).days / 30.5, 2) if pd.notna(x) else np.nan)
+
+    for col in QUARTERLY_EPS_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    df['EPS'] = pd.to_numeric(df['EPS'], errors='coerce')
+    df['Last 4Q EPS'] = np.where(df['EPS'].notna(), df['EPS'], df[QUARTERLY_EPS_COLUMNS].sum(axis=1))
+    df['EPS+'] = np.where(df['Last 4Q EPS'] >= 0, df['Last 4Q EPS'], 0)
+    df['前1年度 EPS'] = pd.to_numeric(df['前1年度 EPS'], errors='coerce')
+    df['EPS+'] = np.where(df['前1年度 EPS'] > df['EPS+'], df['前1年度 EPS'], df['EPS+'])
+
+    df['配息率'] = pd.to_numeric(df['配息率'], errors='coerce')
+    df['M配息率'] = np.where(df['配息率'].notna(), df['配息率'], df[PAYOUT_COLUMNS].median(axis=1))
+    df['M配息率'] = np.where(df['M配息率'] > 1, 1, df['M配息率'])
+    df['下次配息金額'] = pd.to_numeric(df['下次配息金額'], errors='coerce')
+    df['預估配息'] = np.where(df['下次配息金額'].notna(), df['下次配息金額'], df['EPS+'] * df['M配息率'])
+    df['預估配息'] = np.where(df['下一次除息金額'].notna(), df['下一次除息金額'], df['預估配息'])
+    df['支撐'] = np.where(df['support'].notna(), df['預估配息'] / df['support'], df['預估配息'] / 0.05)
+    df['最新收盤價'] = pd.to_numeric(df['最新收盤價'], errors='coerce')
+    df['預期報酬'] = df['支撐'] / df['最新收盤價'] - 1
+    df['預期月報酬'] = df.apply(lambda x: x['預期報酬'] / x['month'] if x['month'] != 0 else np.nan, axis=1)
+    return df
+
+def compare(new, old):
+    """回傳結果不一致的欄位"""
+    mismatched = []
+    for col in OUTPUT_COLUMNS:
+        if col == 'NDD':
+            equal = (pd.to_datetime(new[col]) == pd.to_datetime(old[col])) | (new[col].isna() & old[col].isna())
+            ok = bool(equal.all())
+        else:
+            ok = np.allclose(new[col].to_numpy(dtype=float), old[col].to_numpy(dtype=float), equal_nan=True)
+        if not ok:
+            mismatched.append(col)
+    return mismatched
+
+def timed(fn, df, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(df)
+    return result, (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--legacy-rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--price-shift', type=float, nargs='*', default=[0.0], help='股價變動比例，例如 -0.1 表示下跌 10%%')
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    print(f"合成資料 {len(df):,} 列")
+
+    sample = df.head(args.legacy_rows)
+    new, new_seconds = timed(score, sample, args.repeat)
+    old, old_seconds = timed(legacy_score, sample, 1)
+    mismatched = compare(new, old)
+    print(f"比對 {len(sample):,} 列：向量化 {new_seconds * 1000:.1f} ms，逐列 {old_seconds * 1000:.1f} ms，"
+          f"加速 {old_seconds / new_seconds:.1f} 倍，結果{'一致' if not mismatched else '不一致: ' + ', '.join(mismatched)}")
+
+    for shift in args.price_shift:
+        scenario = df.assign(最新收盤價=df['最新收盤價'] * (1 + shift))
+        result, seconds = timed(score, scenario, args.repeat)
+        print(f"股價 {shift:+.0%}：{seconds * 1000:.1f} ms ({len(df) / seconds:,.0f} 列/秒)，"
+              f"預期月報酬中位數 {result['預期月報酬'].median():.4f}")
+
+    if mismatched:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
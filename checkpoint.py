@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import settings
+
+# 逐檔股票的檢查點：每完成一檔就附加一行 JSON，中斷後以相同的執行編號重跑時略過已完成的股票
+# 每次執行預設產生新的執行編號 (不沿用任何檢查點)；要接續中斷的執行，指定 LHF_RUN_ID 或以 --resume 接續最近一次
+RUN_ID = os.environ.get('LHF_RUN_ID') or f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+CHECKPOINT_DIR = os.environ.get('LHF_CHECKPOINT_DIR', os.path.join(settings.OUTPUT_DIR, 'checkpoints'))
+
+def _to_builtin(value):
+    return value.item() if hasattr(value, 'item') else str(value)
+
+class Journal:
+    """單一階段在本次執行中的附加式紀錄，每行為 {"code": 股票代碼, "record": 結果}"""
+
+    def __init__(self, stage, run_id=None):
+        self.path = os.path.join(CHECKPOINT_DIR, run_id or RUN_ID, f'{stage}.jsonl')
+        self.lock = threading.Lock()
+
+    def load(self):
+        """讀取已完成的股票 {股票代碼: 結果}，最後一行寫到一半 (中斷時) 則略過"""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                completed[entry['code']] = entry['record']
+        if completed:
+            print(f"從檢查點 {self.path} 恢復 {len(completed)} 檔已完成的股票")
+        return completed
+
+    def append(self, stock_code, record):
+        line = json.dumps({'code': str(stock_code), 'record': record}, ensure_ascii=False, default=_to_builtin)
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+
+def open_journal(stage):
+    return Journal(stage)
+
+def resume_latest():
+    """
+    改用最近一次執行的編號，讓各階段略過該次已完成的股票。
+    已指定 LHF_RUN_ID 時以指定的為準；沒有任何檢查點時維持新的編號並回傳 None
+    """
+    global RUN_ID
+    if os.environ.get('LHF_RUN_ID'):
+        return RUN_ID
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return None
+    runs = [entry for entry in os.scandir(CHECKPOINT_DIR) if entry.is_dir() and entry.name != RUN_ID]
+    if not runs:
+        return None
+    RUN_ID = max(runs, key=lambda entry: entry.stat().st_mtime).name
+    return RUN_ID
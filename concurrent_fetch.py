@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from http_cache import cached_get, POOL_MAXSIZE
+
+# 各主機的同時請求數與速率由 rate_limit 依節流狀況動態調整，這裡不另外設限
+def _fetch_one(job):
+    url, kwargs = job
+    try:
+        return cached_get(url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        return e
+
+def fetch_all(jobs):
+    """
+    同時送出多個 GET 請求，各主機的同時連線數由 rate_limit 控制。
+    實際的連線由 http_cache 共用的 Session 連線池提供，並經過同一份回應快取。
+    :param jobs: [(url, cached_get 的參數 dict), ...]
+    :return: 與 jobs 順序相同的 Response 列表，失敗的請求以例外物件代替
+    """
+    jobs = [(job, {}) if isinstance(job, str) else job for job in jobs]
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(POOL_MAXSIZE, len(jobs))) as executor:
+        return list(executor.map(_fetch_one, jobs))
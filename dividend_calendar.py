@@ -0,0 +1,66 @@
+import threading
+import requests
+import pandas as pd
+from http_cache import cached_get
+
+# 全市場除權息預告表 (上市、上櫃目前共用同一支API)
+TWT48U_URL = "https://openapi.twse.com.tw/v1/exchangeReport/TWT48U_ALL"
+
+_lock = threading.Lock()
+_calendar = None
+
+# 將民國日期欄位 (例如 1130815) 一次轉換為西元日期字串 'YYYY-MM-DD'
+def convert_to_western_dates(minguo_dates):
+    s = minguo_dates.astype(str).str.strip()
+    year = pd.to_numeric(s.str[:3], errors='coerce') + 1911
+    western = year.astype('Int64').astype(str) + s.str[3:5] + s.str[5:7]
+    return pd.to_datetime(western, format='%Y%m%d', errors='coerce').dt.strftime('%Y-%m-%d')
+
+# 下載並整理整份除權息預告表，回傳 {股票代號: (下一次除息日, 下一次除息金額)}
+def build_dividend_calendar(data):
+    df = pd.DataFrame(data)
+    if df.empty or 'Code' not in df.columns:
+        return {}
+
+    df['Code'] = df['Code'].astype(str).str.strip()
+    df['Date'] = convert_to_western_dates(df['Date'])
+    df['CashDividend'] = pd.to_numeric(df['CashDividend'], errors='coerce')
+
+    # 同一檔股票有多筆時，沿用原本取第一筆的邏輯
+    df = df.drop_duplicates(subset='Code', keep='first')
+    return dict(zip(df['Code'], zip(df['Date'], df['CashDividend'])))
+
+def fetch_dividend_calendar():
+    try:
+        response = cached_get(TWT48U_URL)
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type') or ''
+        if 'application/json' in content_type:
+            return build_dividend_calendar(response.json())
+    except requests.exceptions.RequestException as e:
+        print(f"抓取API時發生錯誤: {e}")
+    return {}
+
+# 每次執行只下載一次，所有執行緒共用同一份索引
+def get_dividend_calendar():
+    global _calendar
+    if _calendar is None:
+        with _lock:
+            if _calendar is None:
+                _calendar = fetch_dividend_calendar()
+    return _calendar
+
+def lookup_next_dividend(stock_code):
+    """查詢股票的下一次除息日與除息金額，查無資料時回傳 ('無法取得資料', '無法取得資料')"""
+    entry = get_dividend_calendar().get(str(stock_code).strip())
+    if entry is None:
+        return '無法取得資料', '無法取得資料'
+
+    next_ex_div_date, next_dividend_amount = entry
+    if pd.isna(next_ex_div_date):
+        next_ex_div_date = '無法取得資料'
+    if pd.isna(next_dividend_amount):
+        next_dividend_amount = '無法取得資料'
+    else:
+        next_dividend_amount = float(next_dividend_amount)
+    return next_ex_div_date, next_dividend_amount
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import settings
+
+# 從 Yahoo 取得的基本面資料 (營業利益、稅前淨利、EPS、配息) 的本機時間序列，跨次執行累積
+# 以 (股票代碼, 期別, 項目) 為鍵，期別格式：年度 'YYYY'、季度 'YYYYQn'、配息 'YYYY-MM-DD'
+STORE_PATH = os.environ.get('LHF_FUNDAMENTALS_DB', os.path.join(settings.OUTPUT_DIR, 'fundamentals.sqlite'))
+
+# freq：'A' 年度、'Q' 季度、'D' 事件日期
+PERIOD_FORMATS = {
+    'A': lambda ts: f'{ts.year}',
+    'Q': lambda ts: f'{ts.year}Q{ts.quarter}',
+    'D': lambda ts: ts.strftime('%Y-%m-%d'),
+}
+
+_lock = threading.Lock()
+_conn = None
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(STORE_PATH) or '.', exist_ok=True)
+        _conn = sqlite3.connect(STORE_PATH, check_same_thread=False)
+        _conn.execute('PRAGMA journal_mode=WAL')
+        _conn.execute('''CREATE TABLE IF NOT EXISTS fundamentals (
+            code TEXT,
+            period TEXT,
+            metric TEXT,
+            freq TEXT,
+            value REAL,
+            updated_at REAL,
+            PRIMARY KEY (code, period, metric)
+        )''')
+        _conn.execute('CREATE INDEX IF NOT EXISTS fundamentals_metric ON fundamentals (metric, freq, period)')
+        _conn.commit()
+    return _conn
+
+def record_series(stock_code, metric, series, freq):
+    """寫入一檔股票單一項目的時間序列 (以日期為索引)，同一期別以最新的值覆蓋"""
+    series = pd.to_numeric(series, errors='coerce').dropna()
+    if series.empty:
+        return
+    to_period = PERIOD_FORMATS[freq]
+    now = time.time()
+    rows = [(str(stock_code), to_period(pd.Timestamp(ts)), metric, freq, float(value), now)
+            for ts, value in series.items()]
+    with _lock:
+        conn = _connection()
+        conn.executemany('INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?, ?, ?, ?)', rows)
+        conn.commit()
+
+def record_statement(stock_code, statement, metrics, freq):
+    """由 Yahoo 的財報表 (項目為列、日期為欄) 寫入指定的項目，缺少的項目略過"""
+    for metric in metrics:
+        if metric in statement.index:
+            record_series(stock_code, metric, statement.loc[metric], freq)
+
+def query(sql, params=()):
+    with _lock:
+        return pd.read_sql_query(sql, _connection(), params=params)
+
+def metric_frame(metric, freq, stock_codes=None):
+    """回傳以股票代碼為列、期別為欄 (由舊到新) 的寬表，可一次查詢整個市場"""
+    df = query('SELECT code, period, value FROM fundamentals WHERE metric = ? AND freq = ?', (metric, freq))
+    frame = df.pivot(index='code', columns='period', values='value').sort_index(axis=1)
+    if stock_codes is not None:
+        frame = frame.reindex([str(code) for code in stock_codes])
+    return frame
+
+def latest_values(metric, freq, n):
+    """
+    每檔股票最近 n 期的數值。
+    :return: 以股票代碼為列的 DataFrame，欄位 1..n 由舊到新，不足 n 期的股票不列入
+    """
+    df = query('''
+        SELECT code, value, rank FROM (
+            SELECT code, value, ROW_NUMBER() OVER (PARTITION BY code ORDER BY period DESC) AS rank
+            FROM fundamentals WHERE metric = ? AND freq = ?
+        ) WHERE rank <= ?
+    ''', (metric, freq, n))
+    frame = df.pivot(index='code', columns='rank', values='value').dropna()
+    # rank 1 為最新一期，反轉成由舊到新
+    frame = frame[sorted(frame.columns, reverse=True)]
+    frame.columns = range(1, len(frame.columns) + 1)
+    return frame
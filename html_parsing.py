@@ -0,0 +1,109 @@
+import os
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # 沒有安裝 lxml 時只能使用 BeautifulSoup
+    lxml = None
+
+# 解析後端：'bs4' 為原本的 BeautifulSoup(html.parser)，'lxml' 為快速路徑
+# 兩者的結果由 tests/test_html_parsing.py 比對，預設仍使用 bs4，需要時以 LHF_HTML_PARSER=lxml 切換
+BACKENDS = ['bs4', 'lxml'] if lxml is not None else ['bs4']
+DEFAULT_BACKEND = os.environ.get('LHF_HTML_PARSER') or 'bs4'
+
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+def _backend(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"不支援的解析後端: {backend}")
+    return backend
+
+def _lxml_document(html):
+    # lxml 不接受帶有編碼宣告的 Unicode 字串
+    return lxml.html.document_fromstring(_XML_DECLARATION.sub('', html))
+
+# 等同 BeautifulSoup 的 get_text(strip=True)
+def _lxml_stripped_text(element):
+    return ''.join(text.strip() for text in element.itertext())
+
+# ---- ISIN 股票代碼清單 (isin.twse.com.tw) ----
+
+def parse_isin_codes(html, backend=None):
+    """回傳頁面中所有純數字的股票代碼"""
+    if _backend(backend) == 'lxml':
+        tables = _lxml_document(html).xpath('//table[contains(concat(" ", normalize-space(@class), " "), " h4 ")]')
+        rows = tables[0].xpath('.//tr')[1:]  # 跳過標題行
+        first_cells = (row.xpath('.//td') for row in rows)
+        cell_texts = (cols[0].text_content() for cols in first_cells if len(cols) > 0)
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
+        table = soup.find("table", {"class": "h4"})
+        rows = table.find_all("tr")[1:]  # 跳過標題行
+        first_cells = (row.find_all("td") for row in rows)
+        cell_texts = (cols[0].text for cols in first_cells if len(cols) > 0)
+
+    stock_codes = []
+    for text in cell_texts:
+        stock_info = text.strip()
+        if stock_info:
+            code = stock_info.split()[0]
+            if code.isdigit():
+                stock_codes.append(code)
+    return stock_codes
+
+# ---- 月營收 (t21sc03) ----
+
+def parse_revenue_rows(html, backend=None):
+    """回傳 {公司代號: 當月營收}，同一代號出現多次時取第一筆，營收不是數字時為 None"""
+    if _backend(backend) == 'lxml':
+        rows = (row.xpath('.//td') for row in _lxml_document(html).iter('tr'))
+        cells = ((_lxml_stripped_text(cols[0]), _lxml_stripped_text(cols[2])) for cols in rows if len(cols) >= 3)
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
+        rows = (row.find_all('td') for row in soup.find_all('tr'))
+        cells = ((cols[0].get_text(strip=True), cols[2].get_text(strip=True)) for cols in rows if len(cols) >= 3)
+
+    revenues = {}
+    for code, revenue in cells:
+        if code and code not in revenues:
+            revenue = revenue.replace(',', '')
+            revenues[code] = int(revenue) if revenue.isdigit() else None
+    return revenues
+
+# ---- 財務報表 (t164sb01) ----
+
+def _bs4_section_rows(soup, section_id):
+    div = soup.find('div', id=section_id)  # 動態查找 section
+    if div is None:
+        return []
+    table = div.find_next('table')
+    rows = []
+    for row in table.find_all('tr'):
+        cols = row.find_all('td')
+        if cols:
+            rows.append([col.text.strip() for col in cols[:3]])
+    return rows
+
+def _lxml_section_rows(document, section_id):
+    divs = document.xpath('//div[@id=$section_id]', section_id=section_id)
+    if not divs:
+        return []
+    # 與 find_next 相同：section 之後 (含其內部) 的第一個 table
+    table = divs[0].xpath('(descendant::table | following::table)[1]')[0]
+    rows = []
+    for row in table.xpath('.//tr'):
+        cols = row.xpath('.//td')
+        if cols:
+            rows.append([col.text_content().strip() for col in cols[:3]])
+    return rows
+
+def parse_statement_sections(html, section_ids, backend=None):
+    """一份財報頁面只解析一次，回傳 {section_id: [[代號, 會計項目, 數值文字], ...]}"""
+    if _backend(backend) == 'lxml':
+        document = _lxml_document(html)
+        return {section_id: _lxml_section_rows(document, section_id) for section_id in section_ids}
+    soup = BeautifulSoup(html, 'html.parser')
+    return {section_id: _bs4_section_rows(soup, section_id) for section_id in section_ids}
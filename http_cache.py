@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import replay
+import settings
+from rate_limit import limiter_for_url
+from resilience import resilient_call, timeout_for
+
+# 各類資料的快取有效時間 (秒)，None 表示永不過期
+DAY = 24 * 60 * 60
+TTL_DAILY = 12 * 60 * 60          # OpenAPI 每日資料、除權息預告、股票代碼清單、公告中的月營收
+TTL_MONTHLY_REVENUE = 30 * DAY    # 公告期已過的月營收頁面，只會偶爾更正
+TTL_IMMUTABLE = None              # 已公告的季度財報不會再變動
+
+# 依網址判斷 TTL，未列出的網址預設為一天
+TTL_RULES = [
+    ('mopsov.twse.com.tw/server-java/t164sb01', TTL_IMMUTABLE),
+    ('mopsov.twse.com.tw/nas/t21/', TTL_DAILY),
+    ('openapi.twse.com.tw', TTL_DAILY),
+    ('www.tpex.org.tw/openapi', TTL_DAILY),
+    ('isin.twse.com.tw', TTL_DAILY),
+]
+
+# 嚴格離線模式：只從快取回應，快取沒有的網址直接視為錯誤
+OFFLINE = os.environ.get('LHF_HTTP_OFFLINE', '0') == '1'
+
+CACHE_PATH = os.environ.get('LHF_HTTP_CACHE', os.path.join(settings.OUTPUT_DIR, 'cache', 'http_cache.sqlite'))
+
+class CacheMiss(requests.exceptions.RequestException):
+    """離線模式下快取中沒有對應網址"""
+
+# 共用 Session 的連線池大小，同一主機最多保留的連線數
+POOL_MAXSIZE = 16
+
+_lock = threading.Lock()
+_conn = None
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE))
+_session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE))
+replay.install(_session, pool_maxsize=POOL_MAXSIZE)
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute('PRAGMA journal_mode=WAL')
+        _conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            status INTEGER,
+            headers TEXT,
+            content BLOB,
+            fetched_at REAL
+        )''')
+        _conn.commit()
+    return _conn
+
+def ttl_for(url):
+    for pattern, ttl in TTL_RULES:
+        if pattern in url:
+            return ttl
+    return DAY
+
+def set_offline(offline=True):
+    global OFFLINE
+    OFFLINE = offline
+
+def _load(url):
+    with _lock:
+        row = _connection().execute(
+            'SELECT status, headers, content, fetched_at FROM responses WHERE url = ?', (url,)
+        ).fetchone()
+    if row is None:
+        return None
+    status, headers, content, fetched_at = row
+    return {'status': status, 'headers': json.loads(headers), 'content': content, 'fetched_at': fetched_at}
+
+def _store(url, status, headers, content):
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO responses (url, status, headers, content, fetched_at) VALUES (?, ?, ?, ?, ?)',
+            (url, status, json.dumps(dict(headers)), content, time.time()),
+        )
+        conn.commit()
+
+def _touch(url):
+    with _lock:
+        conn = _connection()
+        conn.execute('UPDATE responses SET fetched_at = ? WHERE url = ?', (time.time(), url))
+        conn.commit()
+
+# 將快取內容還原成 requests.Response，呼叫端沿用 .text / .json() / raise_for_status()
+def _to_response(url, entry, from_cache=True):
+    response = requests.Response()
+    response.url = url
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = entry['content']
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = from_cache
+    return response
+
+def _is_fresh(entry, ttl):
+    return ttl is None or time.time() - entry['fetched_at'] < ttl
+
+# 實際連線一律經過該主機的斷路器與速率限制，未指定 timeout 時使用該主機的 (連線, 讀取) 逾時
+def _fetch(url, headers, timeout):
+    limiter = limiter_for_url(url)
+    timeout = timeout or timeout_for(limiter.endpoint)
+    return resilient_call(limiter.endpoint, limiter.call, _session.get, url, headers=headers, timeout=timeout)
+
+def cached_get(url, ttl='auto', timeout=None, cache_if=None):
+    """
+    帶快取的 GET 請求。
+    :param url: 請求網址 (同時作為快取鍵)
+    :param ttl: 快取有效秒數，'auto' 依 TTL_RULES 判斷，None 表示永不過期
+    :param timeout: 傳給 requests 的 timeout，預設依主機使用 resilience.TIMEOUTS
+    :param cache_if: 判斷回應是否值得寫入快取的函數，例如尚未公告的財報頁面不應永久保存
+    """
+    if ttl == 'auto':
+        ttl = ttl_for(url)
+
+    entry = _load(url)
+    if entry is not None and (OFFLINE or _is_fresh(entry, ttl)):
+        return _to_response(url, entry)
+    if OFFLINE:
+        raise CacheMiss(f"離線模式下快取中沒有 {url}")
+
+    # 已有過期的快取時，帶上 ETag / Last-Modified 讓伺服器判斷內容是否變動
+    headers = {}
+    if entry is not None:
+        cached_headers = CaseInsensitiveDict(entry['headers'])
+        etag = cached_headers.get('ETag')
+        last_modified = cached_headers.get('Last-Modified')
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    response = _fetch(url, headers, timeout)
+    if response.status_code == 304 and entry is not None:
+        _touch(url)
+        return _to_response(url, entry)
+
+    if response.status_code == 200 and (cache_if is None or cache_if(response)):
+        _store(url, response.status_code, response.headers, response.content)
+    response.from_cache = False
+    return response
+
+# 列出快取中網址包含指定字串的項目
+def cached_urls(pattern=''):
+    with _lock:
+        rows = _connection().execute(
+            "SELECT url FROM responses WHERE instr(url, ?) > 0 ORDER BY url", (pattern,)
+        ).fetchall()
+    return [row[0] for row in rows]
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import requests
+
+import settings
+from dividend_calendar import get_dividend_calendar
+from http_cache import cached_get
+from yahoo_snapshot import get_snapshot
+
+# 增量模式：財報期別與除權息事件都沒有變動的股票，沿用上次從 Yahoo 取得的結果
+INCREMENTAL = os.environ.get('LHF_INCREMENTAL', '0') == '1'
+
+STATE_PATH = os.environ.get('LHF_INCREMENTAL_STATE', os.path.join(settings.OUTPUT_DIR, 'cache', 'incremental.sqlite'))
+
+# 上市、上櫃各產業別的綜合損益表 OpenAPI，用來判斷每家公司最新公告的財報期別
+INDUSTRY_SUFFIXES = ['ci', 'basi', 'bd', 'fh', 'ins', 'mim']
+PERIOD_URLS = (
+    [f'https://openapi.twse.com.tw/v1/opendata/t187ap06_L_{suffix}' for suffix in INDUSTRY_SUFFIXES]
+    + [f'https://www.tpex.org.tw/openapi/v1/mopsfin_t187ap06_O_{suffix}' for suffix in INDUSTRY_SUFFIXES]
+)
+
+_lock = threading.Lock()
+_conn = None
+_periods = None
+
+def set_incremental(enabled=True):
+    global INCREMENTAL
+    INCREMENTAL = enabled
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(STATE_PATH, check_same_thread=False)
+        _conn.execute('''CREATE TABLE IF NOT EXISTS stock_records (
+            stage TEXT,
+            code TEXT,
+            signature TEXT,
+            record TEXT,
+            updated_at REAL,
+            PRIMARY KEY (stage, code)
+        )''')
+        _conn.commit()
+    return _conn
+
+# 整理 OpenAPI 回傳的資料，回傳 {公司代號: 'YYYYQn'}，民國年轉為西元年
+def build_period_index(rows):
+    periods = {}
+    for row in rows:
+        code = str(row.get('公司代號', '')).strip()
+        year = str(row.get('年度', '')).strip()
+        quarter = str(row.get('季別', '')).strip()
+        if not code or not year.isdigit() or not quarter.isdigit():
+            continue
+        period = f'{int(year) + 1911}Q{quarter}'
+        periods[code] = max(period, periods.get(code, period))
+    return periods
+
+def fetch_reporting_periods():
+    periods = {}
+    for url in PERIOD_URLS:
+        try:
+            response = cached_get(url)
+            response.raise_for_status()
+            for code, period in build_period_index(response.json()).items():
+                periods[code] = max(period, periods.get(code, period))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"無法取得財報期別 {url}: {e}")
+    return periods
+
+# 每次執行只下載一次
+def get_reporting_periods():
+    global _periods
+    if _periods is None:
+        with _lock:
+            if _periods is None:
+                _periods = fetch_reporting_periods()
+    return _periods
+
+def stock_signature(stock_code, period=None):
+    """
+    財報期別加上除權息預告，任一項改變就需要重新抓取；查不到期別時回傳 None
+    :param period: 指定的期別，未指定時使用 OpenAPI 最新公告的期別
+    """
+    stock_code = str(stock_code).strip()
+    if period is None:
+        period = get_reporting_periods().get(stock_code)
+    if period is None:
+        return None
+    return json.dumps([period, get_dividend_calendar().get(stock_code)], default=str)
+
+# Yahoo 季報的欄位為各季的結束日，取最新一季轉為 'YYYYQn'
+def statement_period(statement):
+    if statement is None or statement.empty:
+        return None
+    latest = pd.Timestamp(max(statement.columns))
+    return f'{latest.year}Q{latest.quarter}'
+
+def _to_builtin(value):
+    return value.item() if hasattr(value, 'item') else str(value)
+
+def reuse_records(stage, stock_codes):
+    """
+    取出可以沿用的紀錄。
+    :return: ({股票代碼: 上次的紀錄}, [需要重新抓取的股票代碼])，未啟用增量模式時全部都要重新抓取
+    """
+    stock_codes = [str(code) for code in stock_codes]
+    if not INCREMENTAL:
+        return {}, stock_codes
+
+    with _lock:
+        rows = _connection().execute(
+            'SELECT code, signature, record FROM stock_records WHERE stage = ?', (stage,)
+        ).fetchall()
+    stored = {code: (signature, record) for code, signature, record in rows}
+
+    cached = {}
+    stale = []
+    for code in stock_codes:
+        signature = stock_signature(code)
+        entry = stored.get(code)
+        if signature is not None and entry is not None and entry[0] == signature:
+            cached[code] = json.loads(entry[1])
+        else:
+            stale.append(code)
+    print(f"增量模式 ({stage})：沿用 {len(cached)} 檔，重新抓取 {len(stale)} 檔")
+    return cached, stale
+
+def save_records(stage, records, markets):
+    """
+    保存本次抓取的紀錄 {股票代碼: dict}，連同資料實際所屬的期別與除權息簽章。
+    期別取自本次從 Yahoo 取得的季報，而不是 OpenAPI：公開資訊觀測站通常比 Yahoo 早出現新的一季，
+    這段期間抓到的仍是上一季的資料，簽章與 OpenAPI 的期別不同，下次執行會再重新抓取。
+    :param markets: {股票代碼: 市場類型}，用來找到本次執行中的 Yahoo 快照
+    """
+    if not INCREMENTAL or not records:
+        return
+    now = time.time()
+    rows = []
+    lagging = 0
+    for code, record in records.items():
+        period = statement_period(get_snapshot(code, markets[code]).quarterly_financials)
+        code = str(code)
+        if period is not None and period != get_reporting_periods().get(code):
+            lagging += 1
+        # 沒有季報時簽章為 None，不會被沿用
+        signature = stock_signature(code, period) if period is not None else None
+        rows.append((stage, code, signature, json.dumps(record, ensure_ascii=False, default=_to_builtin), now))
+    if lagging:
+        print(f"增量模式 ({stage})：{lagging} 檔的 Yahoo 季報尚未更新到最新公告的期別，下次執行會再重新抓取")
+    with _lock:
+        conn = _connection()
+        conn.executemany('INSERT OR REPLACE INTO stock_records VALUES (?, ?, ?, ?, ?)', rows)
+        conn.commit()
@@ -0,0 +1,174 @@
+import atexit
+import bisect
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import as_completed
+from contextlib import contextmanager
+
+import settings
+
+# 執行期間的計量：各階段耗時、各資料來源的請求延遲分佈、成功/失敗/重試次數、佇列深度
+# 行程結束時寫出 JSON 與 Prometheus 文字格式，方便比較當天哪個資料來源最慢
+METRICS_DIR = os.environ.get('LHF_METRICS_DIR', os.path.join(settings.OUTPUT_DIR, 'metrics'))
+
+# 延遲分佈的上界 (秒)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}      # (名稱, 資料來源) -> 次數
+_latencies = {}     # 資料來源 -> {'buckets': [...], 'count', 'sum', 'max'}
+_gauges = {}        # (名稱, 標籤) -> {'value', 'max'}
+
+def record_stage(stage, seconds):
+    with _lock:
+        _stages[stage] = seconds
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def count(name, endpoint, n=1):
+    """name: 'success'、'failure'、'retry'、'rejected' (斷路器開啟時直接失敗)"""
+    with _lock:
+        _counters[(name, endpoint)] = _counters.get((name, endpoint), 0) + n
+
+def observe_latency(endpoint, seconds):
+    with _lock:
+        latency = _latencies.get(endpoint)
+        if latency is None:
+            latency = _latencies[endpoint] = {'buckets': [0] * len(LATENCY_BUCKETS), 'count': 0, 'sum': 0.0, 'max': 0.0}
+        latency['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        latency['count'] += 1
+        latency['sum'] += seconds
+        latency['max'] = max(latency['max'], seconds)
+
+# 呼叫端必須持有 _lock
+def _update_gauge(name, label, update):
+    gauge = _gauges.get((name, label))
+    if gauge is None:
+        gauge = _gauges[(name, label)] = {'value': 0, 'max': 0}
+    gauge['value'] = update(gauge['value'])
+    gauge['max'] = max(gauge['max'], gauge['value'])
+
+def set_gauge(name, label, value):
+    with _lock:
+        _update_gauge(name, label, lambda _: value)
+
+def add_gauge(name, label, delta):
+    # 讀取與寫回在同一個臨界區內，同時增減時不會遺失更新
+    with _lock:
+        _update_gauge(name, label, lambda value: value + delta)
+
+def track_completion(futures, pool):
+    """包裝 as_completed，隨著工作完成更新執行緒池尚未完成的工作數"""
+    remaining = len(futures)
+    set_gauge('pool_pending', pool, remaining)
+    for future in as_completed(futures):
+        remaining -= 1
+        set_gauge('pool_pending', pool, remaining)
+        yield future
+
+# 由分佈估計百分位數 (取所在區間的上界)
+def _quantile(latency, q):
+    if latency['count'] == 0:
+        return None
+    target = q * latency['count']
+    cumulative = 0
+    for bound, n in zip(LATENCY_BUCKETS, latency['buckets']):
+        cumulative += n
+        if cumulative >= target:
+            return latency['max'] if math.isinf(bound) else bound
+    return latency['max']
+
+def snapshot():
+    with _lock:
+        endpoints = sorted({endpoint for _, endpoint in _counters} | set(_latencies))
+        result = {
+            'stages': {stage: round(seconds, 3) for stage, seconds in _stages.items()},
+            'endpoints': {},
+            'gauges': {f'{name}{{{label}}}': dict(gauge) for (name, label), gauge in _gauges.items()},
+        }
+        for endpoint in endpoints:
+            latency = _latencies.get(endpoint, {'buckets': [0] * len(LATENCY_BUCKETS), 'count': 0, 'sum': 0.0, 'max': 0.0})
+            result['endpoints'][endpoint] = {
+                'success': _counters.get(('success', endpoint), 0),
+                'failure': _counters.get(('failure', endpoint), 0),
+                'retry': _counters.get(('retry', endpoint), 0),
+                'rejected': _counters.get(('rejected', endpoint), 0),
+                'latency': {
+                    'count': latency['count'],
+                    'sum': round(latency['sum'], 3),
+                    'max': round(latency['max'], 3),
+                    'p50': _quantile(latency, 0.5),
+                    'p95': _quantile(latency, 0.95),
+                    'buckets': dict(zip(['+Inf' if math.isinf(b) else str(b) for b in LATENCY_BUCKETS], latency['buckets'])),
+                },
+            }
+    return result
+
+def to_prometheus(data):
+    lines = ['# TYPE lhf_stage_seconds gauge']
+    lines += [f'lhf_stage_seconds{{stage="{stage}"}} {seconds}' for stage, seconds in data['stages'].items()]
+
+    lines.append('# TYPE lhf_requests_total counter')
+    for endpoint, values in data['endpoints'].items():
+        for outcome in ('success', 'failure'):
+            lines.append(f'lhf_requests_total{{endpoint="{endpoint}",outcome="{outcome}"}} {values[outcome]}')
+    lines.append('# TYPE lhf_retries_total counter')
+    lines += [f'lhf_retries_total{{endpoint="{endpoint}"}} {values["retry"]}' for endpoint, values in data['endpoints'].items()]
+    lines.append('# TYPE lhf_circuit_rejected_total counter')
+    lines += [f'lhf_circuit_rejected_total{{endpoint="{endpoint}"}} {values["rejected"]}' for endpoint, values in data['endpoints'].items()]
+
+    lines.append('# TYPE lhf_request_duration_seconds histogram')
+    for endpoint, values in data['endpoints'].items():
+        cumulative = 0
+        for bound, n in values['latency']['buckets'].items():
+            cumulative += n
+            lines.append(f'lhf_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+        lines.append(f'lhf_request_duration_seconds_sum{{endpoint="{endpoint}"}} {values["latency"]["sum"]}')
+        lines.append(f'lhf_request_duration_seconds_count{{endpoint="{endpoint}"}} {values["latency"]["count"]}')
+
+    lines.append('# TYPE lhf_queue_depth gauge')
+    lines.append('# TYPE lhf_queue_depth_max gauge')
+    for key, gauge in data['gauges'].items():
+        name, label = key[:-1].split('{', 1)
+        lines.append(f'lhf_queue_depth{{queue="{name}",name="{label}"}} {gauge["value"]}')
+        lines.append(f'lhf_queue_depth_max{{queue="{name}",name="{label}"}} {gauge["max"]}')
+    return '\n'.join(lines) + '\n'
+
+def write_metrics(directory=None):
+    """寫出 metrics.json 與 metrics.prom，回傳 JSON 檔路徑"""
+    directory = directory or METRICS_DIR
+    data = snapshot()
+    os.makedirs(directory, exist_ok=True)
+    json_path = os.path.join(directory, 'metrics.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(directory, 'metrics.prom'), 'w', encoding='utf-8') as f:
+        f.write(to_prometheus(data))
+    return json_path
+
+# 行程結束時自動寫出；批次模式的子行程不寫，避免覆蓋主行程的結果
+def _write_at_exit():
+    if multiprocessing.parent_process() is not None:
+        return
+    with _lock:
+        empty = not (_stages or _counters or _latencies or _gauges)
+    if empty:
+        return
+    try:
+        path = write_metrics()
+        print(f"執行計量已保存到 {path}")
+    except OSError as e:
+        print(f"無法寫出執行計量: {e}")
+
+atexit.register(_write_at_exit)
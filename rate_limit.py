@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+import metrics
+
+# 代表伺服器正在節流的 HTTP 狀態碼，由 AdaptiveLimiter 降速後重試
+THROTTLE_STATUS = {429}
+# 伺服器過載：降速，但重試交給 resilience.resilient_call，避免兩層同時重試
+OVERLOAD_STATUS = {503}
+
+# 重播錄製資料時沒有真正的連線，不需要限制速率與同時請求數
+UNLIMITED = os.environ.get('LHF_REPLAY') == 'replay'
+
+def set_unlimited(unlimited=True):
+    global UNLIMITED
+    UNLIMITED = unlimited
+
+class TokenBucket:
+    """權杖桶：平均每秒最多 rate 次，允許短暫累積到 capacity 次"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def is_throttle_error(exc):
+    # yfinance 遇到節流時會拋出 YFRateLimitError，舊版只會在訊息中出現 Too Many Requests
+    if type(exc).__name__ == 'YFRateLimitError':
+        return True
+    response = getattr(exc, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) in THROTTLE_STATUS:
+        return True
+    message = str(exc).lower()
+    return 'too many requests' in message or 'rate limit' in message
+
+def is_connection_error(exc):
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+class AdaptiveLimiter:
+    """
+    單一資料來源的速率與同時請求數控制 (AIMD)。
+    成功 (2xx、3xx) 時緩慢增加同時請求數與每秒請求數，遇到節流、過載或連線錯誤時立即減半，
+    節流的請求會在降速後重試，而不是直接當成無資料。
+    """
+
+    def __init__(self, name, rate, max_concurrency, min_rate=0.2, max_rate=None, throttle_retries=3, endpoint=None):
+        self.name = name
+        self.endpoint = endpoint or name  # 計量使用的資料來源名稱
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 2
+        self.throttle_retries = throttle_retries
+        self.bucket = TokenBucket(rate)
+        self.active = 0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        if UNLIMITED:
+            yield
+            return
+        with self.cond:
+            if self.active >= int(self.concurrency):
+                # 記錄等待名額的請求數 (佇列深度)
+                metrics.add_gauge('limiter_waiting', self.endpoint, 1)
+                while self.active >= int(self.concurrency):
+                    self.cond.wait()
+                metrics.add_gauge('limiter_waiting', self.endpoint, -1)
+            self.active += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    # 加法增加：每次成功讓同時請求數約增加 1/目前上限，速率小幅增加
+    def on_success(self):
+        with self.cond:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            rate = min(self.max_rate, self.bucket.rate + 0.05)
+            self.cond.notify_all()
+        self.bucket.set_rate(rate)
+
+    # 乘法減少：同一波節流只減半一次，避免同時失敗的請求把上限一路降到底
+    def on_throttle(self):
+        with self.cond:
+            now = time.monotonic()
+            if now - self.last_decrease < 1.0:
+                return
+            self.last_decrease = now
+            self.concurrency = max(1.0, self.concurrency / 2)
+            rate = max(self.min_rate, self.bucket.rate / 2)
+        self.bucket.set_rate(rate)
+        print(f"⚠️ {self.name} 疑似節流，降為同時 {int(self.concurrency)} 個請求、每秒 {rate:.2f} 次")
+
+    def call(self, fn, *args, **kwargs):
+        """
+        在限制之下呼叫 fn，每次呼叫記錄一次成功或失敗。
+        只有節流 (429、YFRateLimitError) 在這裡降速並重試；503 只降速，連同其他 5xx 與連線錯誤交由 resilient_call 重試。
+        """
+        for attempt in range(self.throttle_retries + 1):
+            with self.slot():
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as exc:
+                    metrics.observe_latency(self.endpoint, time.perf_counter() - start)
+                    throttled = is_throttle_error(exc)
+                    if throttled or is_connection_error(exc):
+                        self.on_throttle()
+                    if not throttled or attempt == self.throttle_retries:
+                        metrics.count('failure', self.endpoint)
+                        raise
+                else:
+                    metrics.observe_latency(self.endpoint, time.perf_counter() - start)
+                    status = getattr(result, 'status_code', None)
+                    if status is None or status < 400:
+                        self.on_success()
+                        metrics.count('success', self.endpoint)
+                        return result
+                    # 4xx、5xx 不增加速率；伺服器表示過載時降速
+                    if status in THROTTLE_STATUS or status in OVERLOAD_STATUS:
+                        self.on_throttle()
+                    if status not in THROTTLE_STATUS or attempt == self.throttle_retries:
+                        metrics.count('failure', self.endpoint)
+                        return result
+            metrics.count('retry', self.endpoint)
+            # 在名額之外等待，讓其他請求可以繼續
+            time.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+
+# 各資料來源的限制，數值為起始速率 (每秒請求數) 與同時請求數上限
+LIMITERS = {
+    'yahoo': AdaptiveLimiter('Yahoo', rate=6, max_concurrency=16, endpoint='yahoo'),
+    'twse': AdaptiveLimiter('TWSE OpenAPI', rate=2, max_concurrency=4, endpoint='twse'),
+    'tpex': AdaptiveLimiter('TPEx', rate=2, max_concurrency=4, endpoint='tpex'),
+    'mops': AdaptiveLimiter('MOPS', rate=3, max_concurrency=6, endpoint='mops'),
+    'isin': AdaptiveLimiter('ISIN', rate=1, max_concurrency=2, endpoint='isin'),
+}
+
+HOST_LIMITERS = {
+    'openapi.twse.com.tw': 'twse',
+    'www.tpex.org.tw': 'tpex',
+    'mopsov.twse.com.tw': 'mops',
+    'isin.twse.com.tw': 'isin',
+}
+
+_default_lock = threading.Lock()
+
+def limiter_for_url(url):
+    host = urlparse(url).netloc
+    name = HOST_LIMITERS.get(host, host)
+    with _default_lock:
+        if name not in LIMITERS:
+            LIMITERS[name] = AdaptiveLimiter(host, rate=2, max_concurrency=4)
+        return LIMITERS[name]
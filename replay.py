@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import json
+import os
+import pickle
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import settings
+
+# 錄製/重播：LHF_REPLAY=record 時照常連線並保存所有回應，LHF_REPLAY=replay 時完全離線，只從保存的資料回應
+# HTTP 在 http_cache 共用的 Session 上以傳輸層 adapter 處理，Yahoo 則在 yahoo_snapshot 的資料層以 pickle 保存
+MODE = os.environ.get('LHF_REPLAY') or None
+FIXTURE_DIR = os.environ.get('LHF_FIXTURE_DIR', os.path.join(settings.OUTPUT_DIR, 'fixtures'))
+
+MODES = (None, 'record', 'replay')
+if MODE not in MODES:
+    raise ValueError(f"不支援的 LHF_REPLAY: {MODE}")
+
+class FixtureMissing(requests.exceptions.RequestException):
+    """重播模式下沒有對應的錄製資料"""
+
+def set_mode(mode, fixture_dir=None):
+    global MODE, FIXTURE_DIR
+    if mode not in MODES:
+        raise ValueError(f"不支援的重播模式: {mode}")
+    MODE = mode
+    if fixture_dir:
+        FIXTURE_DIR = fixture_dir
+
+def _fixture_path(kind, key, suffix):
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(FIXTURE_DIR, kind, digest[:2], digest + suffix)
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# ---- HTTP ----
+
+class ReplayAdapter(HTTPAdapter):
+    """依請求方法與網址保存/重播回應，條件式請求的標頭不影響鍵值"""
+
+    def send(self, request, **kwargs):
+        key = f'{request.method} {request.url}'
+        path = _fixture_path('http', key, '.json')
+        if MODE == 'replay':
+            if not os.path.exists(path):
+                raise FixtureMissing(f"沒有錄製的回應: {key}", request=request)
+            with open(path, encoding='utf-8') as f:
+                return self._to_response(request, json.load(f))
+
+        response = super().send(request, **kwargs)
+        if MODE == 'record':
+            fixture = {
+                'url': request.url,
+                'status': response.status_code,
+                'headers': dict(response.headers),
+                'content': base64.b64encode(response.content).decode('ascii'),
+            }
+            _write_atomic(path, json.dumps(fixture, ensure_ascii=False).encode('utf-8'))
+        return response
+
+    @staticmethod
+    def _to_response(request, fixture):
+        response = requests.Response()
+        response.request = request
+        response.url = fixture['url']
+        response.status_code = fixture['status']
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        # 內容已解壓縮保存
+        response.headers.pop('Content-Encoding', None)
+        response._content = base64.b64decode(fixture['content'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.reason = 'Replayed'
+        return response
+
+def install(session, pool_maxsize=10):
+    """在錄製/重播模式下，把 session 的 http/https 傳輸換成 ReplayAdapter"""
+    if MODE is None:
+        return
+    adapter = ReplayAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+# ---- Yahoo 資料集 ----
+
+def yahoo_dataset(key, load):
+    """
+    錄製時呼叫 load() 並以 pickle 保存結果，重播時直接讀回；未啟用時只呼叫 load()。
+    :param key: 可唯一代表這份資料的字串，例如 '2330.TW quarterly_financials'
+    """
+    if MODE is None:
+        return load()
+    path = _fixture_path('yahoo', key, '.pkl')
+    if MODE == 'replay':
+        if not os.path.exists(path):
+            raise FixtureMissing(f"沒有錄製的 Yahoo 資料: {key}")
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    data = load()
+    _write_atomic(path, pickle.dumps(data))
+    return data
@@ -0,0 +1,123 @@
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+
+try:
+    import xlsxwriter
+except ImportError:  # 沒有安裝 xlsxwriter 時改用 openpyxl 的 write-only 模式，同樣逐列寫出
+    xlsxwriter = None
+
+# 報表只寫一次：逐列串流寫出，持股列在寫入時直接套用紅色粗體，凍結窗格與日期格式也在寫入時設定
+HIGHLIGHT_COLOR = '#FF0000'
+DATE_FORMAT = 'yyyy-mm-dd'
+DATE_COLUMN_WIDTH = 12
+
+def _column_values(series):
+    """轉成可直接寫入儲存格的 Python 值，空值 (NaN、NaT、pd.NA) 為 None"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.tz_localize(None) if series.dt.tz is not None else series
+        values = series.dt.to_pydatetime()
+    else:
+        values = series.to_numpy(dtype=object)
+    missing = series.isna().to_numpy()
+    return [None if is_missing else (value.item() if hasattr(value, 'item') else value)
+            for value, is_missing in zip(values, missing)]
+
+def _rows(df):
+    columns = [_column_values(df[col]) for col in df.columns]
+    return zip(*columns)
+
+def _is_date(value):
+    return isinstance(value, (date, datetime))
+
+# xlsxwriter 的欄寬以字元數設定，寫入檔案時會加上儲存格邊距；openpyxl 直接寫入檔案中的數值，先換算才會一樣寬
+def _file_column_width(width):
+    pixels = int(width * 7 + 0.5) + 5
+    return int(pixels / 7 * 256) / 256
+
+def write_report(df, path, highlight_codes=(), key_column=None, sheet_name='Sheet1'):
+    """
+    將 DataFrame 寫成 Excel 報表。
+    :param highlight_codes: key_column 的值在其中的列以紅色粗體顯示
+    :param key_column: 用來比對的欄位，預設為第一欄
+    """
+    key_index = df.columns.get_loc(key_column) if key_column is not None else 0
+    highlight_codes = {str(code) for code in highlight_codes}
+    date_columns = [i for i, col in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[col])]
+
+    if xlsxwriter is not None:
+        _write_xlsxwriter(df, path, highlight_codes, key_index, date_columns, sheet_name)
+    else:
+        _write_openpyxl(df, path, highlight_codes, key_index, date_columns, sheet_name)
+    return path
+
+def _write_xlsxwriter(df, path, highlight_codes, key_index, date_columns, sheet_name):
+    # constant_memory：每寫完一列就寫入暫存檔，記憶體用量不隨列數增加
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        formats = {
+            # (是否為持股列, 是否為日期)
+            (False, False): None,
+            (False, True): workbook.add_format({'num_format': DATE_FORMAT}),
+            (True, False): workbook.add_format({'font_color': HIGHLIGHT_COLOR, 'bold': True}),
+            (True, True): workbook.add_format({'font_color': HIGHLIGHT_COLOR, 'bold': True, 'num_format': DATE_FORMAT}),
+        }
+
+        worksheet.freeze_panes(1, 1)
+        for col in date_columns:
+            worksheet.set_column(col, col, DATE_COLUMN_WIDTH)
+        worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+
+        for row_index, values in enumerate(_rows(df), start=1):
+            highlighted = str(values[key_index]) in highlight_codes
+            for col_index, value in enumerate(values):
+                cell_format = formats[(highlighted, _is_date(value))]
+                if value is None:
+                    if cell_format is not None:
+                        worksheet.write_blank(row_index, col_index, None, cell_format)
+                elif _is_date(value):
+                    worksheet.write_datetime(row_index, col_index, value, cell_format)
+                else:
+                    worksheet.write(row_index, col_index, value, cell_format)
+    finally:
+        workbook.close()
+
+def _write_openpyxl(df, path, highlight_codes, key_index, date_columns, sheet_name):
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.freeze_panes = 'B2'
+    for col in date_columns:
+        worksheet.column_dimensions[get_column_letter(col + 1)].width = _file_column_width(DATE_COLUMN_WIDTH)
+
+    thin = Side(style='thin')
+    header_font = Font(bold=True)
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_alignment = Alignment(horizontal='center', vertical='top')
+    # 與 xlsxwriter 相同，顏色包含不透明的 alpha 值
+    highlight_font = Font(color='FF' + HIGHLIGHT_COLOR.lstrip('#'), bold=True)
+
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(worksheet, value=str(col))
+        cell.font, cell.border, cell.alignment = header_font, header_border, header_alignment
+        header.append(cell)
+    worksheet.append(header)
+
+    for values in _rows(df):
+        highlighted = str(values[key_index]) in highlight_codes
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            if highlighted:
+                cell.font = highlight_font
+            if _is_date(value):
+                cell.number_format = DATE_FORMAT
+            row.append(cell)
+        worksheet.append(row)
+    workbook.save(path)
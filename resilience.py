@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+
+import requests
+
+import metrics
+
+# 所有對外請求共用的逾時、重試與斷路器設定
+# timeout 為 (連線, 讀取) 秒數，避免一個卡住的連線佔住執行緒
+DEFAULT_TIMEOUT = (5, 30)
+TIMEOUTS = {
+    'mops': (5, 60),   # 財報頁面較大
+    'isin': (5, 60),
+}
+
+RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 10.0
+# 單次呼叫 (含重試) 的總時限，超過後不再重試，避免少數慢請求拖長整次執行
+CALL_DEADLINE = 120.0
+
+# 伺服器暫時性錯誤 (429 已由 rate_limit 降速重試，503 由 rate_limit 降速後在這裡重試)
+TRANSIENT_STATUS = {500, 502, 503, 504}
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """資料來源連續失敗，斷路器開啟期間直接失敗"""
+
+def timeout_for(endpoint):
+    return TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+# yfinance 使用 curl_cffi 連線，其例外與 requests 同名但不是同一個類別，以類別名稱判斷
+TRANSIENT_ERROR_NAMES = {'ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout', 'ChunkedEncodingError'}
+
+def is_transient_error(exc):
+    if isinstance(exc, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    )):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__)
+
+def is_transient_response(result):
+    return getattr(result, 'status_code', None) in TRANSIENT_STATUS
+
+class CircuitBreaker:
+    """
+    連續 failure_threshold 次暫時性失敗後開啟，reset_timeout 秒內的請求直接失敗；
+    時間到後放行一個試探請求 (半開)，成功則關閉，失敗則再次開啟。
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.probing:
+                self.probing = True
+                return
+        metrics.count('rejected', self.name)
+        raise CircuitOpenError(f"{self.name} 暫時無法連線，斷路器開啟中")
+
+    def on_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    # 試探請求沒有得到可判斷的結果時歸還名額，讓下一個請求繼續試探
+    def release_probe(self):
+        with self.lock:
+            self.probing = False
+
+    def on_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    print(f"⚠️ {self.name} 連續失敗 {self.failures} 次，{self.reset_timeout:.0f} 秒內直接略過")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+_breakers_lock = threading.Lock()
+_breakers = {}
+
+def breaker_for(endpoint):
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+def backoff_delay(attempt):
+    # full jitter：0 到指數上限之間隨機等待，避免同時失敗的請求同時重試
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def resilient_call(endpoint, fn, *args, **kwargs):
+    """
+    經過斷路器呼叫 fn，暫時性錯誤 (連線失敗、逾時、5xx) 以指數退避重試。
+    最後一次仍為 5xx 時回傳該回應，由呼叫端決定如何處理。
+    """
+    breaker = breaker_for(endpoint)
+    deadline = time.monotonic() + CALL_DEADLINE
+    for attempt in range(RETRIES + 1):
+        breaker.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            if not is_transient_error(exc):
+                # 不是連線問題 (例如資料格式錯誤)，不影響斷路器的狀態，只歸還試探名額
+                breaker.release_probe()
+                raise
+            breaker.on_failure()
+            delay = backoff_delay(attempt)
+            if attempt == RETRIES or time.monotonic() + delay > deadline:
+                raise
+        else:
+            if not is_transient_response(result):
+                breaker.on_success()
+                return result
+            breaker.on_failure()
+            delay = backoff_delay(attempt)
+            if attempt == RETRIES or time.monotonic() + delay > deadline:
+                return result
+        metrics.count('retry', endpoint)
+        time.sleep(delay)
@@ -0,0 +1,104 @@
+import os
+import threading
+from datetime import date
+
+import pandas as pd
+
+import settings
+from concurrent_fetch import fetch_all
+from html_parsing import parse_revenue_rows
+from http_cache import TTL_DAILY, TTL_MONTHLY_REVENUE
+
+# 整理後的全市場月營收表 (每個市場、每個月份一個 Parquet 檔)
+REVENUE_DIR = os.path.join(settings.OUTPUT_DIR, 'cache', 'revenue')
+
+# mode 'a' 為上市公司，'b' 為上櫃公司
+MARKETS = {'a': 'sii', 'b': 'otc'}
+
+_lock = threading.Lock()
+_tables = {}
+
+# 月營收頁面網址
+def revenue_url(year, month, mode='a'):
+    republic_year = year - 1911  # 西元轉民國年
+    return f'https://mopsov.twse.com.tw/nas/t21/{MARKETS[mode]}/t21sc03_{republic_year}_{month}_0.html'
+
+# 上個月之前的月份已過公告期，內容不再變動
+def is_settled(year, month):
+    today = date.today()
+    return (today.year - year) * 12 + (today.month - month) >= 2
+
+# 月營收頁面的快取時間：已過公告期的月份可以保存較久
+def revenue_page_ttl(year, month):
+    return TTL_MONTHLY_REVENUE if is_settled(year, month) else TTL_DAILY
+
+def _table_path(year, month, mode):
+    return os.path.join(REVENUE_DIR, f'{MARKETS[mode]}_{year}_{str(month).zfill(2)}.parquet')
+
+# 將整頁月營收解析成 {公司代號: 當月營收}，同一代號出現多次時取第一筆
+def parse_revenue_page(response):
+    response.encoding = 'big5'
+    revenues = parse_revenue_rows(response.text)
+    return pd.Series(revenues, dtype='Int64', name='revenue').rename_axis('code')
+
+def _read_table(path):
+    df = pd.read_parquet(path)
+    return df.set_index('code')['revenue'].astype('Int64')
+
+def _write_table(table, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table.reset_index().to_parquet(path, index=False)
+
+def load_revenue_tables(periods, mode='a'):
+    """
+    取得多個月份的全市場月營收表，每個 (市場, 年, 月) 在本次執行只下載、解析一次。
+    已過公告期的月份會保存為 Parquet，之後不必再連線。
+    :param periods: [(year, month), ...]
+    :return: {(year, month): 以公司代號為索引的營收 Series}，無法取得的月份為空 Series
+    """
+    tables = {}
+    missing = []
+    for year, month in periods:
+        key = (mode, year, month)
+        with _lock:
+            table = _tables.get(key)
+        if table is None and is_settled(year, month) and os.path.exists(_table_path(year, month, mode)):
+            table = _read_table(_table_path(year, month, mode))
+            with _lock:
+                _tables[key] = table
+        if table is None:
+            missing.append((year, month))
+        else:
+            tables[(year, month)] = table
+
+    jobs = [(revenue_url(year, month, mode), {'ttl': revenue_page_ttl(year, month)}) for year, month in missing]
+    for (year, month), response in zip(missing, fetch_all(jobs)):
+        if isinstance(response, Exception):
+            print(f"Failed to fetch revenue for {year}{str(month).zfill(2)}: {str(response)}")
+            tables[(year, month)] = pd.Series(dtype='Int64', name='revenue')
+            continue
+
+        table = parse_revenue_page(response)
+        with _lock:
+            _tables[(mode, year, month)] = table
+        if is_settled(year, month) and not table.empty:
+            _write_table(table, _table_path(year, month, mode))
+        tables[(year, month)] = table
+
+    return tables
+
+def get_revenue_table(year, month, mode='a'):
+    return load_revenue_tables([(year, month)], mode)[(year, month)]
+
+def lookup_revenue(year, month, stock_code, mode='a'):
+    """查詢單一公司單月營收，查無資料時回傳 None"""
+    revenue = get_revenue_table(year, month, mode).get(str(stock_code))
+    return None if revenue is None or pd.isna(revenue) else int(revenue)
+
+def revenue_matrix(periods, mode='a', stock_codes=None):
+    """回傳以公司代號為列、(year, month) 為欄的營收表，可一次查詢整個市場"""
+    tables = load_revenue_tables(periods, mode)
+    matrix = pd.concat({period: tables[period] for period in periods}, axis=1)
+    if stock_codes is not None:
+        matrix = matrix.reindex([str(code) for code in stock_codes])
+    return matrix
@@ -0,0 +1,92 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# 預估配息、支撐價與預期月報酬的向量化計算，輸入為合併手動List後、欄位已有固定型別的 DataFrame
+
+QUARTERLY_EPS_COLUMNS = [f'最近四個季度EPS{i}' for i in range(1, 5)]
+PAYOUT_COLUMNS = ['前1年度 配發率', '前2年度 配發率', '前3年度 配發率']
+
+# 沒有手動設定 support 時使用的殖利率
+DEFAULT_SUPPORT_YIELD = 0.05
+DAYS_PER_MONTH = 30.5
+ONE_YEAR = pd.Timedelta(days=365)
+
+def _numeric(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64')
+
+def _dates(series):
+    return pd.to_datetime(series, errors='coerce').dt.tz_localize(None).dt.normalize()
+
+def score(df, today=None):
+    """
+    計算 NDD、month、Last 4Q EPS、EPS+、M配息率、預估配息、支撐、預期報酬與預期月報酬。
+    :param df: 配息階段的資料合併「手動List」後的 DataFrame
+    :param today: 計算基準日，預設為今天 (方便以不同日期重算情境)
+    :return: 新的 DataFrame，日期欄位為 datetime64
+    """
+    df = df.copy()
+    today = pd.Timestamp(today or date.today()).normalize()
+
+    # 「前一次除息日」與「下一次除息日」相同時，表示預告的除息已經發生，清空下一次的資料
+    last_ex_date = _dates(df['前一次除息日'])
+    next_ex_date = _dates(df['下一次除息日'])
+    already_paid = (last_ex_date == next_ex_date).to_numpy()
+    df['前一次除息日'] = last_ex_date
+    df['下一次除息日'] = next_ex_date.mask(already_paid)
+    next_amount = np.where(already_paid, np.nan, _numeric(df['下一次除息金額']))
+    df['下一次除息金額'] = next_amount
+
+    # NDD 依序取手動的下次配息時間、下一次除息日、前一次除息日加一年，已經過去的日期再加一年
+    ndd = _dates(df['下次配息時間']).fillna(df['下一次除息日']).fillna(last_ex_date + ONE_YEAR)
+    ndd = ndd.mask(ndd < today, ndd + ONE_YEAR)
+    df['NDD'] = ndd
+    month = ((ndd - today).dt.days.to_numpy(dtype='float64') / DAYS_PER_MONTH).round(2)
+    df['month'] = month
+
+    # 季度 EPS 非數字視為 0；手動 EPS 有值時優先使用
+    quarterly_eps = np.nan_to_num(np.column_stack([_numeric(df[col]) for col in QUARTERLY_EPS_COLUMNS]), nan=0.0)
+    df[QUARTERLY_EPS_COLUMNS] = quarterly_eps
+    manual_eps = _numeric(df['EPS'])
+    df['EPS'] = manual_eps
+    last_4q_eps = np.where(np.isnan(manual_eps), quarterly_eps.sum(axis=1), manual_eps)
+    df['Last 4Q EPS'] = last_4q_eps
+
+    # EPS+ 不小於 0，且前1年度 EPS 較大時以前1年度 EPS 取代
+    last_year_eps = _numeric(df['前1年度 EPS'])
+    df['前1年度 EPS'] = last_year_eps
+    eps_plus = np.where(last_4q_eps >= 0, last_4q_eps, 0.0)
+    eps_plus = np.where(last_year_eps > eps_plus, last_year_eps, eps_plus)
+    df['EPS+'] = eps_plus
+
+    # 手動配息率優先，否則取前三年度配發率的中位數 (空值略過)，上限為 1
+    manual_payout = _numeric(df['配息率'])
+    df['配息率'] = manual_payout
+    payout_median = df[PAYOUT_COLUMNS].apply(pd.to_numeric, errors='coerce').median(axis=1).to_numpy(dtype='float64')
+    payout = np.where(np.isnan(manual_payout), payout_median, manual_payout)
+    payout = np.where(payout > 1, 1.0, payout)
+    df['M配息率'] = payout
+
+    # 預估配息：除權息預告金額 > 手動下次配息金額 > EPS+ x M配息率
+    manual_amount = _numeric(df['下次配息金額'])
+    df['下次配息金額'] = manual_amount
+    estimated = np.where(np.isnan(manual_amount), eps_plus * payout, manual_amount)
+    estimated = np.where(np.isnan(next_amount), estimated, next_amount)
+    df['預估配息'] = estimated
+
+    support_yield = _numeric(df['support'])
+    support_price = estimated / np.where(np.isnan(support_yield), DEFAULT_SUPPORT_YIELD, support_yield)
+    df['支撐'] = support_price
+
+    price = _numeric(df['最新收盤價'])
+    df['最新收盤價'] = price
+    # 收盤價為 0 (無成交) 時無法計算報酬，視為空值而不是無限大
+    expected_return = support_price / np.where(price > 0, price, np.nan) - 1
+    df['預期報酬'] = expected_return
+
+    # month 為 0 時預期月報酬為空值，避免除以 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['預期月報酬'] = np.where(month != 0, expected_return / month, np.nan)
+
+    return df
@@ -0,0 +1,23 @@
+import os
+
+# 各階段共用的檔案路徑，預設沿用原本的雲端硬碟位置，可用環境變數覆寫 (例如在 Linux 上執行)
+HORIZON_DIR = os.environ.get('LHF_HORIZON_DIR', r'G:\我的雲端硬碟\Horizon')
+OUTPUT_DIR = os.environ.get('LHF_OUTPUT_DIR', os.path.join(HORIZON_DIR, 'python_stock'))
+
+# 手動維護的資料 ("EPS持股"、"手動List" sheet)
+ADDITIONAL_DATA_PATH = os.environ.get('LHF_ADDITIONAL_DATA', os.path.join(HORIZON_DIR, 'Additional Data_LHF.xlsx'))
+
+# 2/1~3/10 期間用來替換累計營收增減的 Excel
+SPECIAL_PERIOD_REVENUE_PATH = os.environ.get('LHF_SPECIAL_PERIOD_REVENUE', os.path.join(OUTPUT_DIR, '202412revenue.xlsx'))
+
+# 各階段的輸出，階段之間以 Parquet 交接 (欄位型別見 stage_io.py)
+STAGE_TWO_PATH = os.path.join(OUTPUT_DIR, 'financial_data_stage_two.parquet')
+DIVIDEND_STAGE_PATH = os.path.join(OUTPUT_DIR, 'qualified_stocks_financial_data.parquet')
+
+# 給人看的階段二 CSV 匯出，下游不再讀取
+STAGE_TWO_EXPORT_PATH = os.path.join(OUTPUT_DIR, 'financial_data_stage_two.csv')
+REPORT_PATH = os.path.join(OUTPUT_DIR, 'qualified_stocks_financial_data_with_estimated_payout_and_NDD.xlsx')
+
+# 財報 (Income Statement.py) 的輸出資料夾與格式範本
+STATEMENTS_DIR = os.path.join(OUTPUT_DIR, 'stocks')
+STATEMENT_TEMPLATE_PATH = os.path.join(OUTPUT_DIR, '1537_is_2024Q3_202501_formation.xlsx')
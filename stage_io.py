@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+
+# 階段之間以 Parquet 交接資料，欄位型別固定，下游不必再從文字推斷
+# 型別: 'string'、'float'、'thousands' (以千元為單位的金額)、'percent' (「12.3%」轉為 0.123，無法解析時為 NaN)、'date'
+
+REVENUE_COLUMNS = [
+    '營業收入-當月營收', '營業收入-上月營收', '營業收入-去年當月營收',
+    '累計營業收入-當月累計營收', '累計營業收入-上月累計營收', '累計營業收入-去年累計營收'
+]
+
+STAGE_TWO_SCHEMA = {
+    '公司代號': 'string',
+    '公司名稱': 'string',
+    '產業別': 'string',
+    '市場類型': 'string',
+    **{col: 'thousands' for col in REVENUE_COLUMNS},
+    '營業收入-上月比較增減(%)': 'float',
+    '營業收入-去年同月增減(%)': 'float',
+    '累計營業收入-前期比較增減(%)': 'float',
+    'Operating Income / Pretax Income Ratio': 'percent',
+    **{f'{item} Q{i}': 'thousands' for i in range(1, 5) for item in ('Operating Income', 'Pretax Income')},
+    'qualification': 'string',
+}
+
+DIVIDEND_STAGE_SCHEMA = {
+    '股票代碼': 'string',
+    '市場類型': 'string',
+    '前0年度配息': 'float',
+    **{f'前{i}年度 {item}': kind for i in range(1, 5)
+       for item, kind in (('EPS', 'float'), ('股息', 'float'), ('配發率', 'percent'))},
+    **{f'最近四個季度EPS{i}': 'float' for i in range(1, 5)},
+    '前一次除息日': 'date',
+    '下一次除息日': 'date',
+    '下一次除息金額': 'float',
+}
+
+def _to_float(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    text = series.astype('string').str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(text, errors='coerce').astype('float64')
+
+def _to_ratio(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    text = series.astype('string').str.strip().str.rstrip('%')
+    return pd.to_numeric(text, errors='coerce').astype('float64') / 100
+
+def _to_date(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series.astype('string'), format='%Y-%m-%d', errors='coerce')
+
+CONVERTERS = {
+    'string': lambda series: series.astype('string'),
+    'float': _to_float,
+    'thousands': _to_float,
+    'percent': _to_ratio,
+    'date': _to_date,
+}
+
+def enforce_schema(df, schema):
+    """依 schema 轉換欄位型別並排列順序，schema 以外的欄位以字串保留在後面"""
+    df = df.copy()
+    for col, kind in schema.items():
+        if col not in df.columns:
+            df[col] = pd.NA
+        df[col] = CONVERTERS[kind](df[col])
+    extras = [col for col in df.columns if col not in schema]
+    for col in extras:
+        df[col] = df[col].astype('string')
+    return df[list(schema) + extras].reset_index(drop=True)
+
+def write_stage(df, path, schema):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    enforce_schema(df, schema).to_parquet(path, index=False)
+
+def read_stage(path, schema):
+    return enforce_schema(pd.read_parquet(path), schema)
+
+# 匯出給人看的 CSV 時才格式化：千元金額加上千分位，比例轉為百分比文字
+def _format_thousands(series):
+    return series.round(2).map('{:,.2f}'.format, na_action='ignore')
+
+def _format_percent(series):
+    return (series * 100).round(2).map('{:.2f}%'.format, na_action='ignore').fillna('N/A')
+
+FORMATTERS = {
+    'thousands': _format_thousands,
+    'percent': _format_percent,
+}
+
+def export_csv(df, path, schema):
+    df = enforce_schema(df, schema)
+    for col, kind in schema.items():
+        if kind in FORMATTERS:
+            df[col] = FORMATTERS[kind](df[col])
+    df.to_csv(path, index=False, encoding='utf-8-sig')
@@ -0,0 +1,120 @@
+import pandas as pd
+from openpyxl import load_workbook
+from copy import copy
+from functools import lru_cache
+from openpyxl.cell import MergedCell
+from openpyxl.styles import NamedStyle
+
+import settings
+
+# 從範本匯入的工作表
+IMPORT_SHEETS = ['★IS(IFRS項目)', 'breakdown', 'Financial Statements_adj']
+
+class TemplateStyles:
+    """
+    範本解析一次後的內容：要匯入的工作表資料、去除重複後的儲存格樣式，以及各工作表每個儲存格使用的樣式與列寬。
+    套用到新的工作簿時只需註冊少量具名樣式，再依樣式編號指定給儲存格。
+    """
+
+    def __init__(self, file_path, sheets):
+        wb = load_workbook(file_path)
+        self.sheet_frames = {}
+        self.styles = []
+        self.cell_styles = {}
+        self.column_widths = {}
+        style_ids = {}
+
+        for sheet_name in sheets:
+            if sheet_name in wb.sheetnames:
+                # 將工作表內容轉換為 DataFrame
+                data = wb[sheet_name].values
+                columns = next(data)
+                self.sheet_frames[sheet_name] = pd.DataFrame(data, columns=columns)
+
+        for ws in wb.worksheets:
+            cells = []
+            for row in ws.iter_rows():
+                for cell in row:
+                    if isinstance(cell, MergedCell) or not cell.has_style:  # 略過合併單元格與沒有格式的儲存格
+                        continue
+                    key = (copy(cell.font), copy(cell.fill), copy(cell.border), copy(cell.alignment), cell.number_format)
+                    if key not in style_ids:
+                        style_ids[key] = len(self.styles)
+                        self.styles.append(key)
+                    cells.append((cell.row, cell.column, style_ids[key]))
+            self.cell_styles[ws.title] = cells
+            self.column_widths[ws.title] = {col_letter: col_dim.width for col_letter, col_dim in ws.column_dimensions.items()}
+
+    @staticmethod
+    def style_name(style_id):
+        return f'template_{style_id}'
+
+    def register_styles(self, workbook):
+        for style_id, (font, fill, border, alignment, number_format) in enumerate(self.styles):
+            name = self.style_name(style_id)
+            if name not in workbook.named_styles:
+                workbook.add_named_style(NamedStyle(
+                    name=name, font=font, fill=fill, border=border, alignment=alignment, number_format=number_format,
+                ))
+
+    def apply(self, sheet_name, target_ws):
+        # 單獨設置字體、填充、邊框、對齊和數字格式 (一次以具名樣式指定)
+        names = [self.style_name(style_id) for style_id in range(len(self.styles))]
+        for row, column, style_id in self.cell_styles.get(sheet_name, []):
+            target_ws.cell(row=row, column=column).style = names[style_id]
+
+        # 設置列寬
+        for col_letter, width in self.column_widths.get(sheet_name, {}).items():
+            target_ws.column_dimensions[col_letter].width = width
+
+# 每個行程只解析一次範本，批次模式中同一個子行程處理的公司共用
+@lru_cache(maxsize=None)
+def load_template(file_path):
+    return TemplateStyles(file_path, IMPORT_SHEETS)
+
+# 匯入範本的指定工作表 (使用已解析的內容，不再重新開啟範本)
+def import_sheets_from_template(template, writer):
+    for sheet_name, df in template.sheet_frames.items():
+        # 將 DataFrame 寫入目標文件的工作表
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+def freeze_panes_in_worksheet(target_wb, sheet_name, freeze_cell):
+    """
+    凍結指定工作表的窗格。
+    :param target_wb: openpyxl 加載的工作簿
+    :param sheet_name: 工作表名稱
+    :param freeze_cell: 凍結窗格的起始單元格，例如 "C3"
+    """
+    if sheet_name in target_wb.sheetnames:
+        ws = target_wb[sheet_name]
+        ws.freeze_panes = freeze_cell
+
+# 將多個報表寫入同一Excel文件的不同工作表，並套用範本格式
+# 放在獨立模組中，讓批次模式可以交給子行程執行
+def write_statement_workbook(file_path, income_df, balance_sheet_df, revenue_df):
+    template = load_template(settings.STATEMENT_TEMPLATE_PATH)
+
+    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        # 先寫入 Financial Statements
+        income_df.to_excel(writer, index=False, sheet_name='Financial Statements')
+
+        # 寫入 Balance Sheet
+        if not balance_sheet_df.empty:
+            balance_sheet_df.to_excel(writer, index=False, sheet_name='Balance Sheet')
+
+        # 再寫入 Revenue
+        revenue_df.to_excel(writer, index=False, sheet_name='Revenue')
+
+        # 匯入範本的指定工作表
+        import_sheets_from_template(template, writer)
+
+        # 直接在寫入中的工作簿套用範本格式，離開 with 時只存檔一次
+        target_wb = writer.book
+        template.register_styles(target_wb)
+        for sheet_name in target_wb.sheetnames:
+            template.apply(sheet_name, target_wb[sheet_name])
+
+        # 對「★IS(IFRS項目)」套用凍結窗格
+        freeze_panes_in_worksheet(target_wb, "★IS(IFRS項目)", "C3")
+
+    return file_path
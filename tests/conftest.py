@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# 測試的輸出 (HTTP 快取、計量等) 一律寫到暫存資料夾，不寫到預設的雲端硬碟路徑
+os.environ.setdefault('LHF_OUTPUT_DIR', tempfile.mkdtemp(prefix='lhf_tests_'))
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import checkpoint
+
+@pytest.fixture
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'CHECKPOINT_DIR', str(tmp_path))
+    monkeypatch.delenv('LHF_RUN_ID', raising=False)
+    return tmp_path
+
+def test_new_run_does_not_replay_previous_journal(checkpoint_dir, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'RUN_ID', 'run-1')
+    checkpoint.open_journal('dividend').append('2330', {'EPS': 1})
+    assert checkpoint.open_journal('dividend').load() == {'2330': {'EPS': 1}}
+
+    monkeypatch.setattr(checkpoint, 'RUN_ID', 'run-2')
+    assert checkpoint.open_journal('dividend').load() == {}
+
+def test_resume_latest_picks_previous_run(checkpoint_dir, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'RUN_ID', 'run-1')
+    journal = checkpoint.open_journal('stage_two')
+    journal.append('1101', {'ratio': 1.0})
+    # 最後一行寫到一半 (中斷) 時略過
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"code": "2330", "rec')
+
+    monkeypatch.setattr(checkpoint, 'RUN_ID', 'run-2')
+    assert checkpoint.resume_latest() == 'run-1'
+    assert checkpoint.open_journal('stage_two').load() == {'1101': {'ratio': 1.0}}
+
+def test_resume_without_checkpoints_keeps_new_run(checkpoint_dir, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'RUN_ID', 'run-1')
+    assert checkpoint.resume_latest() is None
+    assert checkpoint.RUN_ID == 'run-1'
+
+def test_explicit_run_id_wins_over_resume(checkpoint_dir, monkeypatch):
+    os.makedirs(checkpoint_dir / 'older')
+    monkeypatch.setenv('LHF_RUN_ID', 'pinned')
+    monkeypatch.setattr(checkpoint, 'RUN_ID', 'pinned')
+    assert checkpoint.resume_latest() == 'pinned'
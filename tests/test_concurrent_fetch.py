@@ -0,0 +1,34 @@
+import asyncio
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import concurrent_fetch
+
+def fake_get(url, **kwargs):
+    # 越前面的網址越慢完成，確認回傳順序仍與輸入相同
+    time.sleep(0.01 * (5 - int(url[-1])))
+    if url.endswith('3'):
+        raise requests.exceptions.ConnectionError(url)
+    return (url, kwargs)
+
+def test_results_keep_job_order_and_errors_in_place(monkeypatch):
+    monkeypatch.setattr(concurrent_fetch, 'cached_get', fake_get)
+    results = concurrent_fetch.fetch_all(['u1', ('u2', {'ttl': None}), 'u3', 'u4'])
+    assert results[0] == ('u1', {})
+    assert results[1] == ('u2', {'ttl': None})
+    assert isinstance(results[2], requests.exceptions.ConnectionError)
+    assert results[3] == ('u4', {})
+    assert concurrent_fetch.fetch_all([]) == []
+
+def test_callable_from_running_event_loop(monkeypatch):
+    monkeypatch.setattr(concurrent_fetch, 'cached_get', fake_get)
+
+    async def caller():
+        return concurrent_fetch.fetch_all(['u1', 'u2'])
+
+    assert asyncio.run(caller()) == [('u1', {}), ('u2', {})]
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dividend_calendar
+
+# TWT48U_ALL 的部分欄位，包含空白、缺少、格式錯誤與不存在的日期
+PAYLOAD = [
+    {'Code': '2330 ', 'Date': '1140612', 'CashDividend': '4.5'},
+    {'Code': '1101', 'Date': '', 'CashDividend': '1.0'},
+    {'Code': '2317', 'Date': '1141301', 'CashDividend': 'x'},
+    {'Code': '2454', 'CashDividend': '20'},
+    {'Code': '2330', 'Date': '1140101', 'CashDividend': '9'},
+    {'Code': '3008', 'Date': None, 'CashDividend': None},
+    {'Code': '6505', 'Date': 'abc', 'CashDividend': '2'},
+    {'Code': '0050', 'Date': '1131231', 'CashDividend': '0.5'},
+]
+
+@pytest.fixture
+def calendar(monkeypatch):
+    monkeypatch.setattr(dividend_calendar, '_calendar', None)
+    monkeypatch.setattr(dividend_calendar, 'fetch_dividend_calendar',
+                        lambda: dividend_calendar.build_dividend_calendar(PAYLOAD))
+
+def test_minguo_dates_convert_to_western():
+    calendar = dividend_calendar.build_dividend_calendar(PAYLOAD)
+    assert calendar['2330'] == ('2025-06-12', 4.5)
+    assert calendar['0050'] == ('2024-12-31', 0.5)
+
+def test_malformed_and_missing_dates(calendar):
+    lookup = dividend_calendar.lookup_next_dividend
+    assert lookup('1101') == ('無法取得資料', 1.0)
+    assert lookup('2317') == ('無法取得資料', '無法取得資料')
+    assert lookup('2454') == ('無法取得資料', 20.0)
+    assert lookup('3008') == ('無法取得資料', '無法取得資料')
+    assert lookup('6505') == ('無法取得資料', 2.0)
+
+def test_first_entry_wins_and_unknown_codes(calendar):
+    lookup = dividend_calendar.lookup_next_dividend
+    # 代號前後的空白會被去除，重複的代號沿用第一筆
+    assert lookup(' 2330') == ('2025-06-12', 4.5)
+    assert lookup(9999) == ('無法取得資料', '無法取得資料')
+
+def test_empty_payload():
+    assert dividend_calendar.build_dividend_calendar([]) == {}
+
+def test_fetched_once_across_threads(monkeypatch):
+    calls = []
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return dividend_calendar.build_dividend_calendar(PAYLOAD)
+    monkeypatch.setattr(dividend_calendar, '_calendar', None)
+    monkeypatch.setattr(dividend_calendar, 'fetch_dividend_calendar', fetch)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(dividend_calendar.lookup_next_dividend('2330')), daemon=True)
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [('2025-06-12', 4.5)] * 16
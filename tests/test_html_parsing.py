@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_parsing
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SECTIONS = ['StatementOfComprehensiveIncome', 'BalanceSheet', 'CashFlowStatement']
+
+requires_lxml = pytest.mark.skipif('lxml' not in html_parsing.BACKENDS, reason='沒有安裝 lxml')
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+def test_default_backend_is_bs4():
+    if not os.environ.get('LHF_HTML_PARSER'):
+        assert html_parsing.DEFAULT_BACKEND == 'bs4'
+    with pytest.raises(ValueError):
+        html_parsing.parse_isin_codes(read_fixture('isin.html'), backend='html5lib')
+
+def test_isin_codes():
+    # 只讀取 class="h4" 的第一個表格，略過分類列、空白列與含字母的代號
+    codes = html_parsing.parse_isin_codes(read_fixture('isin.html'), backend='bs4')
+    assert codes == ['1101', '1102', '2330', '2454', '030001']
+
+def test_revenue_rows():
+    revenues = html_parsing.parse_revenue_rows(read_fixture('revenue.html'), backend='bs4')
+    assert revenues['1101'] == 10235418
+    assert revenues['2330'] == 263708978  # 重複的代號取第一筆
+    assert revenues['2454'] == 48110520
+    assert revenues['3008'] is None and revenues['6505'] is None
+    assert revenues['1216'] == 0
+
+def test_statement_sections():
+    sections = html_parsing.parse_statement_sections(read_fixture('statement.html'), SECTIONS, backend='bs4')
+    assert sections['StatementOfComprehensiveIncome'] == [
+        ['4000', '營業收入合計', '2,894,307,699'],
+        ['5000', '營業成本合計', '(1,269,954,026)'],
+        ['9750', '基本每股盈餘', '45.25'],
+        ['9850', '稀釋每股盈餘'],
+    ]
+    assert sections['BalanceSheet'][0] == ['1100', '現金及約當現金', '2,127,627,043']
+    assert sections['BalanceSheet'][2] == ['', '流動資產合計', '3,000,000,000']
+    assert sections['CashFlowStatement'] == []
+
+@requires_lxml
+def test_isin_backends_match():
+    html = read_fixture('isin.html')
+    assert html_parsing.parse_isin_codes(html, backend='lxml') == html_parsing.parse_isin_codes(html, backend='bs4')
+
+@requires_lxml
+def test_revenue_backends_match():
+    html = read_fixture('revenue.html')
+    assert html_parsing.parse_revenue_rows(html, backend='lxml') == html_parsing.parse_revenue_rows(html, backend='bs4')
+
+@requires_lxml
+def test_statement_backends_match():
+    html = read_fixture('statement.html')
+    assert (html_parsing.parse_statement_sections(html, SECTIONS, backend='lxml')
+            == html_parsing.parse_statement_sections(html, SECTIONS, backend='bs4'))
@@ -0,0 +1,116 @@
+import os
+import sys
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_cache
+import rate_limit
+
+class StubSession:
+    """代替 requests.Session，依序回傳預先準備的 (狀態碼, 標頭, 內容)，並記錄每次請求的標頭"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append({'url': url, 'headers': dict(headers or {}), 'timeout': timeout})
+        status, response_headers, content = self.responses.pop(0)
+        response = requests.Response()
+        response.url = url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(response_headers)
+        response._content = content
+        return response
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, 'CACHE_PATH', str(tmp_path / 'http_cache.sqlite'))
+    monkeypatch.setattr(http_cache, '_conn', None)
+    monkeypatch.setattr(http_cache, 'OFFLINE', False)
+    monkeypatch.setattr(rate_limit, 'UNLIMITED', True)
+    stub = StubSession()
+    monkeypatch.setattr(http_cache, '_session', stub)
+    return stub
+
+def expire(url):
+    with http_cache._lock:
+        conn = http_cache._connection()
+        conn.execute('UPDATE responses SET fetched_at = 0 WHERE url = ?', (url,))
+        conn.commit()
+
+URL = 'https://openapi.twse.com.tw/v1/opendata/t187ap05_L'
+
+def test_ttl_rules():
+    assert http_cache.ttl_for('https://mopsov.twse.com.tw/server-java/t164sb01?step=3') is None
+    assert http_cache.ttl_for('https://mopsov.twse.com.tw/nas/t21/sii/t21sc03_113_1_0.html') == http_cache.TTL_DAILY
+    assert http_cache.ttl_for(URL) == http_cache.TTL_DAILY
+    assert http_cache.ttl_for('https://example.com/other') == http_cache.DAY
+
+def test_fresh_entry_is_served_from_cache(session):
+    session.responses.append((200, {}, b'first'))
+    assert http_cache.cached_get(URL).content == b'first'
+    response = http_cache.cached_get(URL)
+    assert response.content == b'first' and response.from_cache
+    assert len(session.requests) == 1
+
+def test_default_timeout_follows_host(session):
+    session.responses.append((200, {}, b'page'))
+    http_cache.cached_get('https://mopsov.twse.com.tw/server-java/t164sb01?step=1')
+    assert session.requests[0]['timeout'] == (5, 60)
+
+def test_etag_revalidation_returns_cached_body(session):
+    session.responses.append((200, {'ETag': '"v1"'}, b'body'))
+    http_cache.cached_get(URL)
+    expire(URL)
+
+    session.responses.append((304, {}, b''))
+    response = http_cache.cached_get(URL)
+    assert session.requests[1]['headers'] == {'If-None-Match': '"v1"'}
+    assert response.status_code == 200 and response.content == b'body' and response.from_cache
+
+    # 304 之後重新計算有效時間，不再發出請求
+    http_cache.cached_get(URL)
+    assert len(session.requests) == 2
+
+def test_last_modified_revalidation_replaces_changed_body(session):
+    session.responses.append((200, {'Last-Modified': 'Tue, 01 Jul 2025 00:00:00 GMT'}, b'old'))
+    http_cache.cached_get(URL)
+    expire(URL)
+
+    session.responses.append((200, {}, b'new'))
+    response = http_cache.cached_get(URL)
+    assert session.requests[1]['headers'] == {'If-Modified-Since': 'Tue, 01 Jul 2025 00:00:00 GMT'}
+    assert response.content == b'new' and not response.from_cache
+    assert http_cache.cached_get(URL).content == b'new'
+
+def test_immutable_entry_never_expires(session):
+    url = 'https://mopsov.twse.com.tw/server-java/t164sb01?step=3&SYEAR=2024'
+    session.responses.append((200, {}, b'statement'))
+    http_cache.cached_get(url)
+    expire(url)
+    assert http_cache.cached_get(url).content == b'statement'
+    assert len(session.requests) == 1
+
+def test_cache_if_and_errors_are_not_stored(session):
+    session.responses += [(200, {}, b'not yet'), (404, {}, b'missing'), (200, {}, b'ready')]
+    http_cache.cached_get(URL, cache_if=lambda response: response.content != b'not yet')
+    assert http_cache.cached_get(URL).status_code == 404
+    assert http_cache.cached_get(URL).content == b'ready'
+    assert http_cache.cached_urls() == [URL]
+    assert len(session.requests) == 3
+
+def test_offline_serves_stale_entries_and_raises_on_miss(session, monkeypatch):
+    session.responses.append((200, {}, b'cached'))
+    http_cache.cached_get(URL)
+    expire(URL)
+
+    monkeypatch.setattr(http_cache, 'OFFLINE', True)
+    assert http_cache.cached_get(URL).content == b'cached'
+    with pytest.raises(http_cache.CacheMiss):
+        http_cache.cached_get('https://openapi.twse.com.tw/v1/other')
+    assert len(session.requests) == 1
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import incremental
+
+class StubSnapshot:
+    def __init__(self, quarter_ends):
+        self.quarterly_financials = pd.DataFrame(
+            {pd.Timestamp(end): [1.0] for end in quarter_ends}, index=['Diluted EPS'])
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, 'STATE_PATH', str(tmp_path / 'incremental.sqlite'))
+    monkeypatch.setattr(incremental, '_conn', None)
+    monkeypatch.setattr(incremental, 'INCREMENTAL', True)
+    monkeypatch.setattr(incremental, 'get_dividend_calendar', lambda: {})
+    periods = {'2330': '2025Q2'}
+    monkeypatch.setattr(incremental, 'get_reporting_periods', lambda: periods)
+    snapshots = {}
+    monkeypatch.setattr(incremental, 'get_snapshot', lambda code, market: snapshots[code])
+    return periods, snapshots
+
+def test_statement_period_uses_newest_column():
+    snapshot = StubSnapshot(['2024-12-31', '2025-06-30', '2025-03-31'])
+    assert incremental.statement_period(snapshot.quarterly_financials) == '2025Q2'
+    assert incremental.statement_period(pd.DataFrame()) is None
+
+def test_record_behind_openapi_period_is_refetched(state):
+    periods, snapshots = state
+    # OpenAPI 已公告 2025Q2，Yahoo 仍只有到 2025Q1
+    snapshots['2330'] = StubSnapshot(['2024-12-31', '2025-03-31'])
+    incremental.save_records('dividend', {'2330': {'EPS': 1}}, {'2330': '上市'})
+    cached, stale = incremental.reuse_records('dividend', ['2330'])
+    assert cached == {} and stale == ['2330']
+
+    # Yahoo 更新後重新抓取並保存，之後即可沿用
+    snapshots['2330'] = StubSnapshot(['2025-03-31', '2025-06-30'])
+    incremental.save_records('dividend', {'2330': {'EPS': 2}}, {'2330': '上市'})
+    cached, stale = incremental.reuse_records('dividend', ['2330'])
+    assert cached == {'2330': {'EPS': 2}} and stale == []
+
+    # 下一季公告後再次失效
+    periods['2330'] = '2025Q3'
+    cached, stale = incremental.reuse_records('dividend', ['2330'])
+    assert stale == ['2330']
@@ -0,0 +1,40 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+@pytest.fixture
+def switch_often():
+    # 縮短執行緒切換間隔，讓讀取與寫回之間更容易被其他執行緒插入
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def gauge(name, label):
+    return metrics.snapshot()['gauges'][f'{name}{{{label}}}']
+
+def test_add_gauge_does_not_lose_updates(switch_often):
+    threads, steps = 8, 5000
+
+    def work():
+        for _ in range(steps):
+            metrics.add_gauge('test_waiting', 'concurrent', 1)
+
+    workers = [threading.Thread(target=work, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert gauge('test_waiting', 'concurrent') == {'value': threads * steps, 'max': threads * steps}
+
+def test_set_and_add_gauge_track_max():
+    metrics.set_gauge('test_pending', 'pool', 3)
+    metrics.add_gauge('test_pending', 'pool', 2)
+    metrics.add_gauge('test_pending', 'pool', -4)
+    assert gauge('test_pending', 'pool') == {'value': 1, 'max': 5}
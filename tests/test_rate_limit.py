@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+import rate_limit
+import resilience
+
+class StubServer:
+    """依序回傳指定的狀態碼，用完後重複最後一個，並記錄請求次數"""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def get(self):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = self.statuses[min(self.calls, len(self.statuses)) - 1]
+        return response
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'UNLIMITED', True)
+    monkeypatch.setattr(rate_limit.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt: 0)
+
+def make_limiter(endpoint):
+    return rate_limit.AdaptiveLimiter(endpoint, rate=2, max_concurrency=4, endpoint=endpoint)
+
+def counts(endpoint):
+    values = metrics.snapshot()['endpoints'][endpoint]
+    return values['success'], values['failure'], values['retry']
+
+def test_only_2xx_and_3xx_raise_the_rate():
+    limiter = make_limiter('limit-success')
+    for status in (200, 304):
+        limiter.call(StubServer(status).get)
+    assert limiter.bucket.rate == pytest.approx(2.1)
+
+    for status in (404, 500, 502):
+        assert limiter.call(StubServer(status).get).status_code == status
+    assert limiter.bucket.rate == pytest.approx(2.1)
+    assert counts('limit-success') == (2, 3, 0)
+
+def test_429_is_retried_by_the_limiter_only():
+    limiter = make_limiter('limit-429')
+    server = StubServer(429)
+    response = resilience.resilient_call('limit-429', limiter.call, server.get)
+    assert response.status_code == 429
+    assert server.calls == limiter.throttle_retries + 1
+    assert limiter.bucket.rate == 1.0
+    assert counts('limit-429') == (0, 1, limiter.throttle_retries)
+
+def test_429_then_success():
+    limiter = make_limiter('limit-429-ok')
+    server = StubServer(429, 429, 200)
+    assert resilience.resilient_call('limit-429-ok', limiter.call, server.get).status_code == 200
+    assert server.calls == 3
+    assert counts('limit-429-ok') == (1, 0, 2)
+
+def test_503_backs_off_and_is_retried_by_resilient_call_only():
+    limiter = make_limiter('limit-503')
+    server = StubServer(503)
+    response = resilience.resilient_call('limit-503', limiter.call, server.get)
+    assert response.status_code == 503
+    # 兩層不再相乘：只有 resilient_call 重試
+    assert server.calls == resilience.RETRIES + 1
+    assert limiter.bucket.rate == 1.0
+    assert counts('limit-503') == (0, resilience.RETRIES + 1, resilience.RETRIES)
+
+def test_500_keeps_the_rate_and_is_retried_by_resilient_call():
+    limiter = make_limiter('limit-500')
+    server = StubServer(500, 200)
+    assert resilience.resilient_call('limit-500', limiter.call, server.get).status_code == 200
+    assert server.calls == 2
+    assert limiter.bucket.rate == pytest.approx(2.05)
+    assert counts('limit-500') == (1, 1, 1)
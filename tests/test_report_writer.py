@@ -0,0 +1,63 @@
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import report_writer
+
+FRAME = pd.DataFrame({
+    '股票代碼': ['2330', '1101', '0050'],
+    '名稱': ['台積電', '台泥', None],
+    '最新收盤價': [1000.0, np.nan, 150.5],
+    'NDD': pd.to_datetime(['2025-06-12', None, '2026-01-02']),
+    'month': [1, 2, 3],
+})
+
+def write_with(engine, tmp_path, monkeypatch):
+    if engine == 'openpyxl':
+        monkeypatch.setattr(report_writer, 'xlsxwriter', None)
+    elif report_writer.xlsxwriter is None:
+        pytest.skip('沒有安裝 xlsxwriter')
+    path = str(tmp_path / f'{engine}.xlsx')
+    report_writer.write_report(FRAME, path, highlight_codes=[1101])
+    return load_workbook(path).active
+
+def describe(worksheet):
+    """讀回報表中需要一致的部分：值、日期格式、字型、標題樣式、凍結窗格與欄寬"""
+    cells = []
+    for row in worksheet.iter_rows():
+        cells.append([(cell.value, cell.number_format, bool(cell.font.b),
+                       cell.font.color.rgb if cell.font.color is not None and cell.font.color.type == 'rgb' else None,
+                       cell.border.left.style, cell.alignment.horizontal, cell.alignment.vertical)
+                      for cell in row])
+    widths = {key: dimension.width for key, dimension in worksheet.column_dimensions.items() if dimension.width}
+    return {'freeze_panes': worksheet.freeze_panes, 'widths': widths, 'cells': cells}
+
+@pytest.mark.parametrize('engine', ['xlsxwriter', 'openpyxl'])
+def test_report_layout(engine, tmp_path, monkeypatch):
+    worksheet = write_with(engine, tmp_path, monkeypatch)
+    assert worksheet.freeze_panes == 'B2'
+    values = [[cell.value for cell in row] for row in worksheet.iter_rows()]
+    assert values == [
+        ['股票代碼', '名稱', '最新收盤價', 'NDD', 'month'],
+        ['2330', '台積電', 1000, datetime(2025, 6, 12), 1],
+        ['1101', '台泥', None, None, 2],
+        ['0050', None, 150.5, datetime(2026, 1, 2), 3],
+    ]
+    header = worksheet['A1']
+    assert header.font.b and header.border.left.style == 'thin' and header.alignment.horizontal == 'center'
+    assert worksheet['D2'].number_format == report_writer.DATE_FORMAT
+    # 持股列整列為紅色粗體，其他列不變
+    assert all(cell.font.b and cell.font.color.rgb == 'FFFF0000' for cell in worksheet[3])
+    assert not any(cell.font.b for cell in worksheet[2])
+
+def test_fallback_matches_xlsxwriter(tmp_path, monkeypatch):
+    expected = describe(write_with('xlsxwriter', tmp_path, monkeypatch))
+    actual = describe(write_with('openpyxl', tmp_path, monkeypatch))
+    assert actual == expected
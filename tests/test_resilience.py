@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resilience
+
+class FakeClock:
+    """取代 resilience 模組中的 time，sleep 只推進時間"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class Flaky:
+    """依序執行指定的結果：例外類別會被拋出，其他值直接回傳"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, type) and issubclass(outcome, Exception):
+            raise outcome('stub')
+        return outcome
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    monkeypatch.setattr(resilience, '_breakers', {})
+    return clock
+
+def test_breaker_opens_half_opens_and_closes(clock, monkeypatch):
+    monkeypatch.setattr(resilience, 'RETRIES', 0)
+    breaker = resilience.breaker_for('stub')
+    down = Flaky(requests.exceptions.ConnectionError)
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            resilience.resilient_call('stub', down)
+    assert breaker.opened_at == clock.now
+
+    # 開啟中：不呼叫 fn 直接失敗
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.resilient_call('stub', down)
+    assert down.calls == breaker.failure_threshold
+
+    # 時間到後只放行一個試探請求，失敗則重新開啟
+    clock.now += breaker.reset_timeout
+    with pytest.raises(requests.exceptions.ConnectionError):
+        resilience.resilient_call('stub', down)
+    assert down.calls == breaker.failure_threshold + 1
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.resilient_call('stub', down)
+
+    # 再次試探成功後關閉
+    clock.now += breaker.reset_timeout
+    assert resilience.resilient_call('stub', Flaky('ok')) == 'ok'
+    assert breaker.opened_at is None and breaker.failures == 0
+    assert resilience.resilient_call('stub', Flaky('again')) == 'again'
+
+def test_retries_stop_at_call_deadline(clock, monkeypatch):
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt: 50.0)
+    down = Flaky(requests.exceptions.Timeout)
+    with pytest.raises(requests.exceptions.Timeout):
+        resilience.resilient_call('slow', down)
+    # 第三次失敗時再等 50 秒會超過 CALL_DEADLINE (120 秒)，不再重試
+    assert down.calls == 3
+    assert clock.sleeps == [50.0, 50.0]
+
+def test_transient_response_is_retried_and_returned(clock, monkeypatch):
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt: 1.0)
+    response = requests.Response()
+    response.status_code = 503
+    server = Flaky(response)
+    assert resilience.resilient_call('busy', server).status_code == 503
+    assert server.calls == resilience.RETRIES + 1
+    assert resilience.breaker_for('busy').failures == resilience.RETRIES + 1
+
+def test_non_transient_error_leaves_breaker_alone(clock):
+    breaker = resilience.breaker_for('parse')
+    for _ in range(breaker.failure_threshold - 1):
+        breaker.on_failure()
+
+    with pytest.raises(ValueError):
+        resilience.resilient_call('parse', Flaky(ValueError))
+    # 沒有重試，也沒有把連續失敗次數歸零
+    assert breaker.failures == breaker.failure_threshold - 1
+    breaker.on_failure()
+    assert breaker.opened_at is not None
+
+    # 試探請求遇到非暫時性錯誤時，斷路器仍開啟，但下一個請求可以繼續試探
+    clock.now += breaker.reset_timeout
+    with pytest.raises(ValueError):
+        resilience.resilient_call('parse', Flaky(ValueError))
+    assert breaker.opened_at is not None
+    assert resilience.resilient_call('parse', Flaky('ok')) == 'ok'
+    assert breaker.opened_at is None
@@ -0,0 +1,94 @@
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import score, QUARTERLY_EPS_COLUMNS, PAYOUT_COLUMNS
+
+TODAY = '2025-06-01'
+
+# 基本資料：近四季 EPS 合計 4、配發率中位數 0.5，預估配息 2、支撐 40
+BASE = {
+    **{col: 1.0 for col in QUARTERLY_EPS_COLUMNS},
+    '前1年度 EPS': 3.0,
+    **{col: 0.5 for col in PAYOUT_COLUMNS},
+    '前一次除息日': None,
+    '下一次除息日': None,
+    '下一次除息金額': np.nan,
+    'EPS': np.nan,
+    '配息率': np.nan,
+    '下次配息時間': None,
+    '下次配息金額': np.nan,
+    'support': np.nan,
+    '最新收盤價': 40.0,
+}
+
+def score_one(**values):
+    result = score(pd.DataFrame([{**BASE, **values}]), today=TODAY)
+    return result.iloc[0]
+
+def test_past_next_dividend_date_rolls_forward_a_year():
+    row = score_one(前一次除息日='2024-11-01', 下一次除息日='2025-05-15', 下一次除息金額=3.0, 最新收盤價=50.0)
+    assert row['NDD'] == pd.Timestamp('2026-05-15')
+    assert row['month'] == 11.41  # 348 天
+    assert row['預估配息'] == 3.0
+    assert row['支撐'] == pytest.approx(60.0)
+    assert row['預期報酬'] == pytest.approx(0.2)
+    assert row['預期月報酬'] == pytest.approx(0.2 / 11.41)
+
+def test_missing_amount_falls_back_to_estimate():
+    row = score_one(前一次除息日='2024-08-01', 下一次除息日='2025-08-01', support=0.04)
+    assert row['NDD'] == pd.Timestamp('2025-08-01')
+    assert row['month'] == 2.0  # 61 天
+    assert row['Last 4Q EPS'] == 4.0 and row['EPS+'] == 4.0 and row['M配息率'] == 0.5
+    assert row['預估配息'] == 2.0
+    assert row['支撐'] == pytest.approx(50.0)
+    assert row['預期報酬'] == pytest.approx(0.25)
+    assert row['預期月報酬'] == pytest.approx(0.125)
+
+    # 手動的下次配息金額優先於 EPS+ x M配息率
+    row = score_one(前一次除息日='2024-08-01', 下一次除息日='2025-08-01', 下次配息金額=2.4)
+    assert row['預估配息'] == 2.4
+    assert row['支撐'] == pytest.approx(48.0)
+    assert row['預期月報酬'] == pytest.approx(0.1)
+
+def test_dividend_already_paid_is_cleared():
+    row = score_one(**{'前一次除息日': '2025-03-20', '下一次除息日': '2025-03-20', '下一次除息金額': 5.0,
+                       QUARTERLY_EPS_COLUMNS[2]: 'x', '前1年度 EPS': 3.5, '配息率': 1.3, '最新收盤價': 35.0})
+    assert pd.isna(row['下一次除息日']) and math.isnan(row['下一次除息金額'])
+    assert row['NDD'] == pd.Timestamp('2026-03-20')
+    assert row['month'] == 9.57  # 292 天
+    assert row['Last 4Q EPS'] == 3.0 and row['EPS+'] == 3.5 and row['M配息率'] == 1.0
+    assert row['預估配息'] == 3.5
+    assert row['預期報酬'] == pytest.approx(1.0)
+    assert row['預期月報酬'] == pytest.approx(1.0 / 9.57)
+
+@pytest.mark.parametrize('price', ['無資料', 0, None])
+def test_unusable_price_leaves_return_empty(price):
+    row = score_one(前一次除息日='2024-12-01', 最新收盤價=price)
+    assert row['NDD'] == pd.Timestamp('2025-12-01')
+    assert row['month'] == 6.0  # 183 天
+    assert row['預估配息'] == 2.0
+    assert row['支撐'] == pytest.approx(40.0)
+    assert math.isnan(row['預期報酬'])
+    assert math.isnan(row['預期月報酬'])
+
+def test_negative_eps_and_dividend_today():
+    row = score_one(**{col: -1.0 for col in QUARTERLY_EPS_COLUMNS}, **{'前1年度 EPS': np.nan, '下次配息時間': TODAY})
+    assert row['Last 4Q EPS'] == -4.0 and row['EPS+'] == 0.0
+    assert row['預估配息'] == 0.0
+    assert row['預期報酬'] == -1.0
+    # month 為 0 時不計算預期月報酬
+    assert row['month'] == 0.0
+    assert math.isnan(row['預期月報酬'])
+
+def test_vectorised_over_rows():
+    df = pd.DataFrame([{**BASE, '前一次除息日': '2024-12-01', '最新收盤價': price} for price in (40.0, 20.0, 80.0)])
+    result = score(df, today=TODAY)
+    assert result['預期報酬'].tolist() == pytest.approx([0.0, 1.0, -0.5])
+    assert result['預期月報酬'].tolist() == pytest.approx([0.0, 1 / 6, -0.5 / 6])
@@ -0,0 +1,79 @@
+import math
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stage_io
+
+SCHEMA = {
+    '公司代號': 'string',
+    '營收': 'thousands',
+    'EPS': 'float',
+    '配發率': 'percent',
+    '除息日': 'date',
+}
+
+# 上游產生的文字資料，包含千分位、空白、百分比與無法解析的值
+RAW = pd.DataFrame({
+    '公司代號': ['2330', '1101', '0050'],
+    '營收': ['263,708,978', ' 1,234.5 ', '-'],
+    'EPS': ['45.25', '-1.2', '無法取得資料'],
+    '配發率': ['12.3%', 'N/A', ' 80% '],
+    '除息日': ['2025-06-12', '無法取得資料', None],
+    '備註': [1, None, 'x'],
+})
+
+def round_trip(tmp_path, df, schema=SCHEMA):
+    path = str(tmp_path / 'stage.parquet')
+    stage_io.write_stage(df, path, schema)
+    return stage_io.read_stage(path, schema)
+
+def test_thousands_and_float(tmp_path):
+    df = round_trip(tmp_path, RAW)
+    assert df['營收'].dtype == 'float64'
+    assert df['營收'].tolist()[:2] == [263708978.0, 1234.5]
+    assert math.isnan(df['營收'][2])
+    assert df['EPS'].tolist()[:2] == [45.25, -1.2]
+    assert math.isnan(df['EPS'][2])
+
+def test_percent(tmp_path):
+    df = round_trip(tmp_path, RAW)
+    assert df['配發率'][0] == pytest.approx(0.123)
+    assert math.isnan(df['配發率'][1])
+    assert df['配發率'][2] == pytest.approx(0.8)
+    # 已是數值的比例不再除以 100
+    assert round_trip(tmp_path, df)['配發率'][0] == pytest.approx(0.123)
+
+def test_dates(tmp_path):
+    df = round_trip(tmp_path, RAW)
+    assert pd.api.types.is_datetime64_any_dtype(df['除息日'])
+    assert df['除息日'][0] == pd.Timestamp('2025-06-12')
+    assert df['除息日'][1:].isna().all()
+
+def test_extra_columns_are_strings_and_missing_columns_added(tmp_path):
+    df = round_trip(tmp_path, RAW.drop(columns=['EPS']))
+    assert list(df.columns) == list(SCHEMA) + ['備註']
+    assert df['備註'].dtype == 'string'
+    assert df['備註'][0] == '1' and pd.isna(df['備註'][1]) and df['備註'][2] == 'x'
+    assert df['EPS'].isna().all()
+    assert df['公司代號'].tolist() == ['2330', '1101', '0050']
+
+def test_export_csv_formats_thousands_and_percent(tmp_path):
+    path = str(tmp_path / 'stage.csv')
+    stage_io.export_csv(RAW, path, SCHEMA)
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    assert df['營收'].tolist() == ['263,708,978.00', '1,234.50', '']
+    assert df['配發率'].tolist() == ['12.30%', 'N/A', '80.00%']
+
+def test_stage_two_monthly_change_columns(tmp_path):
+    schema = stage_io.STAGE_TWO_SCHEMA
+    assert schema['營業收入-上月比較增減(%)'] == 'float'
+    assert schema['營業收入-去年同月增減(%)'] == 'float'
+    raw = pd.DataFrame({'公司代號': ['2330'], '營業收入-上月比較增減(%)': ['-6.97'], '營業收入-去年同月增減(%)': ['35.08']})
+    df = round_trip(tmp_path, raw, schema)
+    assert df['營業收入-上月比較增減(%)'][0] == -6.97
+    assert df['營業收入-去年同月增減(%)'][0] == 35.08
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yahoo_snapshot import TickerSnapshot
+
+class StubTicker:
+    """只提供 actions 的假 yf.Ticker，並記錄被讀取的次數"""
+
+    def __init__(self):
+        self.calls = 0
+
+    @property
+    def actions(self):
+        self.calls += 1
+        index = pd.to_datetime(['2024-07-01', '2024-08-15', '2025-07-01'])
+        return pd.DataFrame({'Dividends': [3.0, 0.0, 3.5], 'Stock Splits': [0.0, 0.0, 0.0]}, index=index)
+
+def read_in_thread(fn, timeout=5):
+    # 在另一個執行緒中讀取，避免鎖死時整個測試卡住
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('value', fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), '讀取快照時鎖死'
+    return result['value']
+
+def make_snapshot():
+    snapshot = TickerSnapshot('2330.TW')
+    snapshot.ticker = StubTicker()
+    return snapshot
+
+def test_dividends_then_actions():
+    snapshot = make_snapshot()
+    dividends = read_in_thread(lambda: snapshot.dividends)
+    assert dividends.tolist() == [3.0, 3.5]
+    actions = read_in_thread(lambda: snapshot.actions)
+    assert len(actions) == 3
+    # 配息由 actions 推導，只抓取一次
+    assert snapshot.ticker.calls == 1
+
+def test_concurrent_readers_share_one_fetch():
+    snapshot = make_snapshot()
+    threads = [threading.Thread(target=lambda: snapshot.dividends, daemon=True) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert snapshot.ticker.calls == 1
+
+def test_derived_dividends_skip_limiter(monkeypatch):
+    import yahoo_snapshot
+    calls = []
+    def call(fn, *args, **kwargs):
+        calls.append(fn)
+        return fn(*args, **kwargs)
+    monkeypatch.setattr(yahoo_snapshot.YAHOO, 'call', call)
+
+    snapshot = make_snapshot()
+    read_in_thread(lambda: snapshot.dividends)
+    # 只有 actions 算一次 Yahoo 請求，dividends 由 actions 推導
+    assert len(calls) == 1
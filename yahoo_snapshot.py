@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import pandas as pd
+import yfinance as yf
+import replay
+from rate_limit import LIMITERS
+from resilience import resilient_call
+
+# 所有 Yahoo 請求共用同一個速率限制
+YAHOO = LIMITERS['yahoo']
+
+_registry_lock = threading.Lock()
+_snapshots = {}
+
+# 根據「市場類型」組出 Yahoo Finance 的股票代號
+def yahoo_symbol(stock_code, market_type):
+    if market_type == "上市":
+        return f"{stock_code}.TW"
+    elif market_type == "上櫃":
+        return f"{stock_code}.TWO"
+    raise ValueError(f"未知的市場類型: {market_type}")
+
+class TickerSnapshot:
+    """單一股票在本次執行中的 Yahoo 資料快照，每種資料最多只抓取一次"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.ticker = yf.Ticker(symbol)
+        self._data = {}
+        # 可重入：dividends 在持有鎖的情況下會再讀取 actions
+        self._lock = threading.RLock()
+
+    def _get(self, name, loader, remote=True):
+        # 同一檔股票的資料只由第一個需要的執行緒抓取，其他執行緒等待後直接共用
+        # remote=False 表示由其他已抓取的資料推導，不經過速率限制與錄製
+        with self._lock:
+            if name not in self._data:
+                if remote:
+                    self._data[name] = replay.yahoo_dataset(
+                        f'{self.symbol} {name}', lambda: resilient_call(YAHOO.endpoint, YAHOO.call, loader))
+                else:
+                    self._data[name] = loader()
+            return self._data[name]
+
+    @property
+    def financials(self):
+        return self._get('financials', lambda: self.ticker.financials)
+
+    @property
+    def quarterly_financials(self):
+        return self._get('quarterly_financials', lambda: self.ticker.quarterly_financials)
+
+    @property
+    def actions(self):
+        return self._get('actions', lambda: self.ticker.actions)
+
+    # 配息紀錄直接由 actions 取出，不再另外請求一次
+    @property
+    def dividends(self):
+        def load():
+            actions = self.actions
+            if 'Dividends' not in actions.columns:
+                return pd.Series(dtype='float64', name='Dividends')
+            dividends = actions['Dividends']
+            return dividends[dividends != 0]
+        return self._get('dividends', load, remote=False)
+
+    def history(self, period):
+        return self._get(f'history_{period}', lambda: self.ticker.history(period=period))
+
+    # 最新收盤價，依序嘗試 1d、5d、1mo 的歷史資料
+    def last_close(self):
+        for period in ["1d", "5d", "1mo"]:
+            history_data = self.history(period)
+            if not history_data.empty:
+                return round(history_data['Close'].iloc[-1], 2)
+        return '無資料'
+
+def get_snapshot(stock_code, market_type):
+    """取得 (或建立) 該股票在本次執行中共用的快照"""
+    symbol = yahoo_symbol(stock_code, market_type)
+    with _registry_lock:
+        snapshot = _snapshots.get(symbol)
+        if snapshot is None:
+            snapshot = _snapshots[symbol] = TickerSnapshot(symbol)
+    return snapshot
+
+def clear_snapshots():
+    with _registry_lock:
+        _snapshots.clear()
+
+# 批次下載多檔股票近期的日線，一次取得所有股票的最新收盤價，回傳 {Yahoo代號: 收盤價}
+def download_last_closes(symbols, period='1mo', batch_size=200):
+    symbols = list(dict.fromkeys(symbols))
+    closes = {}
+    for i in range(0, len(symbols), batch_size):
+        batch = symbols[i:i + batch_size]
+        batch_key = hashlib.sha1(','.join(batch).encode('utf-8')).hexdigest()
+        try:
+            data = replay.yahoo_dataset(
+                f'download {period} {batch_key}',
+                lambda: resilient_call(YAHOO.endpoint, YAHOO.call, yf.download, batch, period=period, interval='1d',
+                                       group_by='column', auto_adjust=True, threads=True, progress=False))
+        except Exception as e:
+            print(f"批次下載收盤價失敗 ({batch[0]} 等 {len(batch)} 檔): {e}")
+            continue
+        if data.empty:
+            continue
+
+        close = data['Close']
+        if isinstance(close, pd.Series):
+            close = close.to_frame(name=batch[0])
+
+        # 每檔股票取最後一筆有效的收盤價
+        last_close = close.ffill().iloc[-1].dropna().round(2)
+        closes.update(last_close.to_dict())
+    return closes